@@ -5,8 +5,134 @@
  * 1. Marcar visualmente las noticias que el usuario ya ha visitado.
  * 2. Manejar la funcionalidad de expandir/colapsar el contenido completo.
  * 3. Gestionar la imagen de fallback en caso de errores de carga.
+ * 4. Cargar el contenido completo de cada noticia solo al abrirlo.
+ * 5. Buscar en títulos y resúmenes con el índice generado en data/search.json.
  */
+
+/**
+ * Normaliza un texto igual que tokenize() en fetch_feeds.py:
+ * minúsculas, sin tildes y separado en palabras.
+ */
+function tokenize(text) {
+    return text.toLowerCase()
+        .normalize("NFD")
+        .replace(/\p{M}/gu, "")
+        .match(/[\p{L}\p{N}]+/gu) || [];
+}
+
+/**
+ * Carga (una sola vez) el fragmento HTML con el contenido de un <details>.
+ */
+function loadContent(details) {
+    const container = details.querySelector(".content");
+    if (!details.dataset.src || details.dataset.loaded) {
+        return;
+    }
+    details.dataset.loaded = "true";
+    container.textContent = "Cargando…";
+    fetch(details.dataset.src)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+            return response.text();
+        })
+        .then(html => {
+            // El fragmento ya viene sanitizado por el generador.
+            container.innerHTML = html;
+        })
+        .catch(() => {
+            delete details.dataset.loaded;
+            container.textContent = "No se pudo cargar el contenido.";
+        });
+}
+
+/**
+ * Búsqueda en el navegador sobre el índice invertido precalculado.
+ * Cada término apunta a una lista ordenada de ordinales de noticia; el
+ * último término se trata como prefijo para buscar mientras se escribe.
+ */
+function setupSearch() {
+    const input = document.getElementById("search");
+    const results = document.getElementById("search-results");
+    if (!input || !results) {
+        return;
+    }
+    let index = null;
+    let loading = null;
+
+    const loadIndex = () => {
+        loading = loading || fetch(input.dataset.index)
+            .then(response => response.json())
+            .then(data => {
+                index = data;
+                index.keys = Object.keys(data.terms);
+                index.stopwords = new Set(data.stopwords);
+            })
+            .catch(() => {
+                loading = null;
+            });
+        return loading;
+    };
+
+    const postings = (term, prefix) => {
+        if (!prefix) {
+            return index.terms[term] || [];
+        }
+        const found = new Set();
+        index.keys.forEach(key => {
+            if (key.startsWith(term)) {
+                index.terms[key].forEach(ordinal => found.add(ordinal));
+            }
+        });
+        return [...found].sort((a, b) => a - b);
+    };
+
+    const search = () => {
+        results.innerHTML = "";
+        if (!index) {
+            results.hidden = true;
+            return;
+        }
+        // Las palabras vacías no están en el índice, así que se ignoran.
+        const terms = tokenize(input.value).filter(term => term.length > 1 && !index.stopwords.has(term));
+        if (!terms.length) {
+            results.hidden = true;
+            return;
+        }
+        let matches = null;
+        terms.forEach((term, position) => {
+            const list = postings(term, position === terms.length - 1);
+            const members = new Set(list);
+            matches = matches === null ? list : matches.filter(ordinal => members.has(ordinal));
+        });
+        matches.slice(0, 20).forEach(ordinal => {
+            const [id, title, link] = index.docs[ordinal];
+            const page = Math.floor(ordinal / index.page_size) + 1;
+            const item = document.createElement("li");
+            const anchor = document.createElement("a");
+            anchor.href = link;
+            anchor.target = "_blank";
+            anchor.textContent = title;
+            const where = document.createElement("a");
+            where.href = input.dataset.root + (page === 1 ? "index.html" : `page/${page}.html`) + `#${id}`;
+            where.textContent = ` (pág. ${page})`;
+            item.append(anchor, where);
+            results.appendChild(item);
+        });
+        if (!matches.length) {
+            results.innerHTML = "<li>Sin resultados.</li>";
+        }
+        results.hidden = false;
+    };
+
+    input.addEventListener("focus", loadIndex);
+    input.addEventListener("input", () => loadIndex().then(search));
+}
+
 document.addEventListener("DOMContentLoaded", () => {
+    setupSearch();
+
     // Lógica para marcar noticias como leídas.
     const visitedIds = new Set(JSON.parse(localStorage.getItem("visitedIds") || "[]"));
 
@@ -40,6 +166,9 @@ document.addEventListener("DOMContentLoaded", () => {
                 event.preventDefault(); // Evita que se navegue al hacer clic en "Leer más".
                 const contentDetails = expandButton.closest('details');
                 contentDetails.open = !contentDetails.open;
+                if (contentDetails.open) {
+                    loadContent(contentDetails);
+                }
             });
         }
 
@@ -47,7 +176,7 @@ document.addEventListener("DOMContentLoaded", () => {
         const thumbnail = item.querySelector(".thumbnail");
         if (thumbnail) {
             thumbnail.onerror = () => {
-                thumbnail.src = 'assets/img/fallback.jpg';
+                thumbnail.src = document.body.dataset.fallback;
             };
         }
     });
@@ -0,0 +1,286 @@
+"""
+Benchmark reproducible de fetch_feeds.py sin acceso a la red.
+
+Levanta un servidor HTTP local que sirve feeds RSS y Atom sintéticos y páginas de
+artículo con imagen en el <head>, ejecuta una generación en frío y otra en
+caliente contra él y muestra el informe de tiempos de cada una.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import fetch_feeds
+
+# Valores por defecto del escenario sintético
+BENCH_FEEDS = 20
+BENCH_ITEMS = 20
+BENCH_ITEM_BYTES = 2000
+BENCH_PAGE_BYTES = 20000
+BENCH_LATENCY = 0.02
+BENCH_FORMAT = "mixed"   # rss, atom o mixed (se alternan)
+BENCH_FORMATS = ("rss", "atom", "mixed")
+BENCH_RUNS = ("cold", "warm")
+
+
+def atom_date(timestamp):
+    """Fecha en formato RFC 3339, como la usan los feeds Atom."""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+
+class SyntheticFeedHandler(BaseHTTPRequestHandler):
+    """
+    Sirve /feed/<n>.xml y /article/<n>/<m> con contenido determinista.
+
+    Responde 304 cuando el cliente envía el ETag vigente, igual que un
+    servidor real, para que la ejecución en caliente sea representativa.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        scenario = self.server.scenario
+        time.sleep(scenario["latency"])
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "feed" and parts[1].endswith(".xml"):
+            feed = int(parts[1][:-4])
+            if self.feed_format(feed) == "atom":
+                body = self.atom_body(feed)
+                content_type = "application/atom+xml; charset=utf-8"
+            else:
+                body = self.feed_body(feed)
+                content_type = "application/rss+xml; charset=utf-8"
+        elif len(parts) == 3 and parts[0] == "article":
+            body = self.article_body(int(parts[1]), int(parts[2]))
+            content_type = "text/html; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def feed_format(self, feed):
+        """Formato del feed n: el del escenario, o alternando RSS y Atom con "mixed"."""
+        fmt = self.server.scenario["format"]
+        if fmt == "mixed":
+            return "atom" if feed % 2 else "rss"
+        return fmt
+
+    def filler(self, feed, item):
+        """Descripción HTML de unos `item_bytes` bytes, distinta para cada entrada."""
+        size = self.server.scenario["item_bytes"]
+        return (f"<p>Noticia {feed}-{item}: lorem ipsum <b>dolor</b> sit amet &amp; consectetur.</p>" *
+                (size // 60 + 1))[:size]
+
+    def timestamp(self, feed, item):
+        """Fecha de publicación de una entrada: un minuto entre entradas."""
+        return 1700000000 - (feed * self.server.scenario["items"] + item) * 60
+
+    def feed_body(self, feed):
+        """Genera un feed RSS con `items` entradas de unos `item_bytes` bytes."""
+        scenario = self.server.scenario
+        base = self.server.base_url
+        items = []
+        for m in range(scenario["items"]):
+            filler = self.filler(feed, m)
+            published = formatdate(self.timestamp(feed, m), usegmt=True)
+            items.append(
+                f"<item><title>Noticia {feed}-{m}</title>"
+                f"<link>{base}/article/{feed}/{m}</link>"
+                f"<guid>{base}/article/{feed}/{m}</guid>"
+                f"<pubDate>{published}</pubDate>"
+                f"<description><![CDATA[{filler}<script>alert(1)</script>]]></description>"
+                f"</item>"
+            )
+        return (
+            f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f"<title>Feed {feed}</title><link>{base}/</link><description>Sintético</description>"
+            f"{''.join(items)}</channel></rss>"
+        ).encode("utf-8")
+
+    def atom_body(self, feed):
+        """Genera un feed Atom con `items` entradas de unos `item_bytes` bytes."""
+        scenario = self.server.scenario
+        base = self.server.base_url
+        entries = []
+        for m in range(scenario["items"]):
+            updated = atom_date(self.timestamp(feed, m))
+            entries.append(
+                f"<entry><title>Noticia {feed}-{m}</title>"
+                f'<link rel="alternate" href="{base}/article/{feed}/{m}"/>'
+                f"<id>{base}/article/{feed}/{m}</id>"
+                f"<published>{updated}</published><updated>{updated}</updated>"
+                f'<content type="html"><![CDATA[{self.filler(feed, m)}<script>alert(1)</script>]]></content>'
+                f"</entry>"
+            )
+        return (
+            f'<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+            f"<title>Feed {feed}</title><id>{base}/feed/{feed}.xml</id>"
+            f'<link rel="alternate" href="{base}/"/><updated>{atom_date(self.timestamp(feed, 0))}</updated>'
+            f"{''.join(entries)}</feed>"
+        ).encode("utf-8")
+
+    def article_body(self, feed, item):
+        """Genera una página de artículo con og:image y relleno hasta `page_bytes`."""
+        scenario = self.server.scenario
+        head = (f'<html><head><title>Noticia {feed}-{item}</title>'
+                f'<meta property="og:image" content="{self.server.base_url}/img/{feed}-{item}.jpg">'
+                f'</head><body>')
+        filler = "<p>Texto del artículo.</p>" * (scenario["page_bytes"] // 25 + 1)
+        return (head + filler[:scenario["page_bytes"]] + "</body></html>").encode("utf-8")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SyntheticFeedServer(ThreadingHTTPServer):
+    """Servidor sintético que ignora los cortes de conexión del cliente."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # fetch_feeds corta a propósito las descargas al llegar al límite
+        # de entradas o al final del <head>
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+@contextmanager
+def feed_server(feeds=BENCH_FEEDS, items=BENCH_ITEMS, item_bytes=BENCH_ITEM_BYTES,
+                page_bytes=BENCH_PAGE_BYTES, latency=BENCH_LATENCY, fmt=BENCH_FORMAT):
+    """
+    Arranca el servidor sintético en un puerto libre de localhost.
+
+    Args:
+        feeds (int): Número de feeds servidos.
+        items (int): Entradas por feed.
+        item_bytes (int): Tamaño aproximado de la descripción de cada entrada.
+        page_bytes (int): Tamaño aproximado de cada página de artículo.
+        latency (float): Segundos de espera antes de cada respuesta.
+        fmt (str): Formato de los feeds: "rss", "atom" o "mixed" (alternos).
+
+    Returns:
+        list: URLs de los feeds servidos (dentro del bloque `with`).
+    """
+    server = SyntheticFeedServer(("127.0.0.1", 0), SyntheticFeedHandler)
+    server.scenario = {"items": items, "item_bytes": item_bytes,
+                       "page_bytes": page_bytes, "latency": latency, "format": fmt}
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield [f"{server.base_url}/feed/{n}.xml" for n in range(feeds)]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run_benchmark(workdir=None, runs=BENCH_RUNS, extra_args=(), **scenario):
+    """
+    Ejecuta fetch_feeds.main() contra el servidor sintético.
+
+    La primera ejecución parte de cachés vacías; las siguientes reutilizan
+    la caché HTTP, la de imágenes y el almacén de noticias.
+
+    Args:
+        workdir (str): Carpeta de trabajo; por defecto una temporal.
+        runs (tuple): Nombre de cada ejecución, en orden.
+        extra_args (tuple): Argumentos adicionales para fetch_feeds.main().
+        **scenario: Parámetros de feed_server().
+
+    Returns:
+        dict: Informe de cada ejecución, indexado por su nombre.
+    """
+    source = os.path.dirname(os.path.abspath(__file__))
+    cleanup = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="feeds-bench-")
+    shutil.copytree(os.path.join(source, "templates"), os.path.join(workdir, "templates"), dirs_exist_ok=True)
+    shutil.copytree(os.path.join(source, "assets"), os.path.join(workdir, "assets"), dirs_exist_ok=True)
+
+    previous = os.getcwd()
+    reports = {}
+    try:
+        os.chdir(workdir)
+        with feed_server(**scenario) as urls:
+            with open("feeds.txt", "w") as f:
+                f.write("\n".join(urls) + "\n")
+            for name in runs:
+                report_path = os.path.join(fetch_feeds.CACHE_DIR, f"bench-{name}.json")
+                fetch_feeds.main(["--report", report_path, *extra_args])
+                with open(report_path, encoding="utf-8") as f:
+                    reports[name] = json.load(f)
+    finally:
+        os.chdir(previous)
+        if cleanup:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return reports
+
+
+def format_report(name, report):
+    """Resume un informe de ejecución en texto legible."""
+    lines = [f"== {name}: {report['wall_seconds']:.3f} s"]
+    for stage, values in report["stages"].items():
+        lines.append(f"   {stage:<18} {values['seconds']:>9.3f} s  x{values['count']:<6} max {values['max']:.3f} s")
+    for counter, value in report["counters"].items():
+        lines.append(f"   {counter:<18} {value:>9}")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de fetch_feeds.py con un servidor de feeds local.")
+    parser.add_argument("--feeds", type=int, default=BENCH_FEEDS, help="número de feeds sintéticos")
+    parser.add_argument("--items", type=int, default=BENCH_ITEMS, help="entradas por feed")
+    parser.add_argument("--item-bytes", type=int, default=BENCH_ITEM_BYTES, help="tamaño de cada entrada")
+    parser.add_argument("--page-bytes", type=int, default=BENCH_PAGE_BYTES, help="tamaño de cada artículo")
+    parser.add_argument("--latency", type=float, default=BENCH_LATENCY, help="latencia simulada por petición (s)")
+    parser.add_argument("--format", choices=BENCH_FORMATS, default=BENCH_FORMAT,
+                        help=f"formato de los feeds; mixed alterna RSS y Atom (por defecto {BENCH_FORMAT})")
+    parser.add_argument("--workdir", help="carpeta de trabajo (por defecto una temporal que se borra)")
+    parser.add_argument("--output", help="guardar los informes en este fichero JSON")
+    parser.add_argument("--max-seconds", type=float,
+                        help="presupuesto de la ejecución en frío; se sale con error si se supera")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+    reports = run_benchmark(workdir=args.workdir, feeds=args.feeds, items=args.items,
+                            item_bytes=args.item_bytes, page_bytes=args.page_bytes, latency=args.latency,
+                            fmt=args.format)
+    for name, report in reports.items():
+        print(format_report(name, report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+    cold = reports[BENCH_RUNS[0]]["wall_seconds"]
+    if args.max_seconds is not None and cold > args.max_seconds:
+        print(f"❌ La ejecución en frío tardó {cold:.3f} s (presupuesto: {args.max_seconds} s)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
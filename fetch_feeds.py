@@ -9,14 +9,47 @@ El contenido se guarda en la carpeta 'dist/' para su publicación.
 import feedparser
 import requests
 from bs4 import BeautifulSoup
+from bs4.dammit import EntitySubstitution
 import json
 from datetime import datetime
 import hashlib
 import os
 from jinja2 import Environment, FileSystemLoader
 import bleach
-import shutil
 import logging
+import argparse
+import pickle
+import threading
+import time
+import random
+import statistics
+import calendar
+import signal
+import re
+import codecs
+import sqlite3
+import gzip
+import unicodedata
+import io
+import posixpath
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+
+# Brotli es opcional: si no está instalado solo se generan los .gz
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Pillow es opcional: sin él las imágenes se publican tal cual, sin reducir
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
 
 
 # Configuración del logging para mejor depuración en GitHub Actions
@@ -38,34 +71,804 @@ ALLOWED_ATTRS = {
     'a': ['href', 'title'],
     'img': ['src', 'alt', 'width', 'height'],
 }
+# Huella de la configuración de sanitización, forma parte de las claves de memoización.
+# SANITIZE_VERSION se incrementa al cambiar cómo se calcula el resultado (invalida lo guardado)
+SANITIZE_VERSION = 2
+SANITIZE_SIGNATURE = json.dumps([SANITIZE_VERSION, ALLOWED_TAGS, ALLOWED_ATTRS], sort_keys=True)
+SANITIZE_PROCESSES = os.cpu_count() or 1
+SANITIZE_POOL_MIN = 16   # Por debajo de este lote no compensa arrancar procesos
+
+# Límites de concurrencia para las descargas de feeds y páginas de artículos
+MAX_WORKERS = 16       # Peticiones simultáneas en total
+MAX_PER_HOST = 4       # Peticiones simultáneas contra un mismo host
+REQUEST_TIMEOUT = 10   # Segundos
+ENTRIES_PER_FEED = 5   # Entradas que se toman de cada feed
+
+# Lectura en streaming: se deja de descargar en cuanto se tiene lo necesario
+CHUNK_SIZE = 16 * 1024
+HEAD_MAX_BYTES = 256 * 1024           # Máximo a leer de una página buscando su imagen
+FEED_MAX_BYTES = 5 * 1024 * 1024      # Máximo a leer de un feed
+
+# Caché local entre ejecuciones (no se publica, ver .gitignore)
+CACHE_DIR = ".cache"
+HTTP_CACHE_MAX_BYTES = 50 * 1024 * 1024
+IMAGE_CACHE_TTL = 7 * 24 * 3600       # Imagen encontrada
+IMAGE_CACHE_MISS_TTL = 24 * 3600      # Página sin imagen (caché negativa)
+IMAGE_CACHE_MAX_ENTRIES = 5000
+
+# Histórico de noticias para las compilaciones incrementales
+ENTRY_STORE_PATH = os.path.join(CACHE_DIR, "entries.sqlite3")
+ARCHIVE_DAYS = 7             # Días que se conserva una noticia que ya salió de su feed
+ARCHIVE_MAX_ENTRIES = 300    # Máximo de noticias publicadas contando el histórico
+FALLBACK_IMAGE = 'assets/img/fallback.jpg'
+
+# Salida publicada
+DIST_DIR = "dist"
+PAGE_SIZE = 30   # Noticias por página HTML y por fragmento JSON
+COMPRESSED_EXTENSIONS = (".html", ".json", ".css", ".js", ".svg", ".txt")
+
+# Assets estáticos: se publican con el hash del contenido en el nombre
+ASSETS_DIR = "assets"
+ASSET_MANIFEST_PATH = os.path.join(CACHE_DIR, "assets.json")
+# Versiones reducidas de las imágenes locales: ancho máximo, formato y calidad
+IMAGE_VARIANTS = {
+    "assets/img/fallback.jpg": (640, "JPEG", 80),
+    "assets/img/ghibli-library.jpg": (1600, "WEBP", 75),
+    "assets/img/hoja.png": (256, "JPEG", 80),
+}
+IMAGE_EXTENSIONS = {"JPEG": ".jpg", "WEBP": ".webp", "PNG": ".png"}
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+# Índice de búsqueda: palabras demasiado comunes para ayudar a encontrar algo
+SEARCH_STOPWORDS = frozenset(
+    "de la el en y a los las del un una por con para es al lo su se que no como mas o "
+    "the of and to in a is for on that with as by at from it an are be this was".split()
+)
+
+# Modo daemon: cada feed se consulta con su propio intervalo
+POLL_MIN_INTERVAL = 5 * 60         # Nunca más a menudo que esto
+POLL_MAX_INTERVAL = 6 * 3600       # Ni más espaciado que esto
+POLL_DEFAULT_INTERVAL = 30 * 60    # Feeds sin fechas de publicación
+POLL_HOST_DELAY = 10               # Segundos entre dos consultas al mismo host
+POLL_JITTER = 0.1                  # Variación aleatoria de cada intervalo (±10%)
+CACHE_CONTROL_MAX_AGE = re.compile(r"max-age\s*=\s*(\d+)")
+
+# --- Métricas ---
+RUN_REPORT_PATH = os.path.join(CACHE_DIR, "run-report.json")
+
+class RunStats:
+    """
+    Tiempos y contadores por etapa de una ejecución, seguros entre hilos.
+
+    Los tiempos de cada etapa se suman entre todos los hilos, así que en
+    las etapas de red pueden superar al tiempo total. Algunas etapas
+    incluyen a otras (por ejemplo, feed.fetch incluye feed.parse).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Vacía las métricas y reinicia el reloj de la ejecución."""
+        with self._lock:
+            self._started = time.time()
+            self._clock = time.perf_counter()
+            self._stages = {}
+            self._counters = {}
+
+    def add(self, name, seconds):
+        """Suma a una etapa una medición ya tomada."""
+        with self._lock:
+            stage = self._stages.setdefault(name, {"count": 0, "seconds": 0.0, "max": 0.0})
+            stage["count"] += 1
+            stage["seconds"] += seconds
+            stage["max"] = max(stage["max"], seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """Mide el tiempo de un bloque `with` y lo suma a la etapa indicada."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def count(self, name, amount=1):
+        """Incrementa un contador (peticiones, bytes, aciertos de caché...)."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def report(self):
+        """
+        Devuelve las métricas en un formato serializable.
+
+        Returns:
+            dict: Inicio, duración total, etapas y contadores.
+        """
+        with self._lock:
+            return {
+                "started": datetime.fromtimestamp(self._started).isoformat(timespec="seconds"),
+                "wall_seconds": round(time.perf_counter() - self._clock, 4),
+                "stages": {
+                    name: {"count": stage["count"], "seconds": round(stage["seconds"], 4),
+                           "max": round(stage["max"], 4)}
+                    for name, stage in sorted(self._stages.items())
+                },
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def save(self, path=RUN_REPORT_PATH):
+        """Escribe el informe de la ejecución en JSON."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+# Métricas de la ejecución en curso
+STATS = RunStats()
+
+# --- Red ---
+class HostDispatcher:
+    """
+    Reparte trabajos en un pool de hilos sin pasar de `limit` peticiones
+    simultáneas contra un mismo host, para no saturar a ningún sitio
+    aunque el pool global sea grande.
+
+    Los trabajos de un host que ya está al límite esperan en una cola
+    propia, sin ocupar un hilo del pool, y se envían en cuanto termina otro
+    de ese host; mientras tanto los hilos libres atienden a los demás hosts.
+    """
+
+    def __init__(self, pool, limit=MAX_PER_HOST):
+        self.pool = pool
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._active = {}
+        self._queues = {}
+
+    def submit(self, url, func, *args):
+        """
+        Programa `func(*args)`, una petición contra el host de `url`.
+
+        Args:
+            url (str): La URL que se va a pedir.
+            func (callable): La función a ejecutar en el pool.
+            *args: Sus argumentos.
+
+        Returns:
+            concurrent.futures.Future: El resultado, utilizable con as_completed.
+        """
+        host = urlsplit(url).netloc.lower()
+        future = Future()
+        with self._lock:
+            if self._active.get(host, 0) >= self.limit:
+                self._queues.setdefault(host, deque()).append((future, func, args))
+                return future
+            self._active[host] = self._active.get(host, 0) + 1
+        self._start(host, future, func, args)
+        return future
+
+    def _start(self, host, future, func, args):
+        inner = self.pool.submit(func, *args)
+        inner.add_done_callback(lambda inner: self._finish(host, future, inner))
+
+    def _finish(self, host, future, inner):
+        # Se libera el hueco (o se pasa al siguiente de la cola) antes de publicar el resultado
+        with self._lock:
+            queue = self._queues.get(host)
+            waiting = queue.popleft() if queue else None
+            if waiting is None:
+                self._active[host] -= 1
+        if waiting is not None:
+            self._start(host, *waiting)
+        if inner.exception() is not None:
+            future.set_exception(inner.exception())
+        else:
+            future.set_result(inner.result())
+
+def create_session(pool_size=MAX_PER_HOST, max_workers=MAX_WORKERS):
+    """
+    Crea una sesión HTTP compartida con un pool de conexiones por host,
+    de modo que las peticiones reutilizan conexiones abiertas (keep-alive).
+
+    Args:
+        pool_size (int): Conexiones que se mantienen abiertas por host.
+        max_workers (int): Peticiones simultáneas en total; como mucho hay
+            ese número de hosts con conexiones activas a la vez.
+
+    Returns:
+        requests.Session: La sesión configurada con los headers por defecto.
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class HttpCache:
+    """
+    Caché HTTP en disco basada en GET condicional (ETag / Last-Modified).
+
+    Por cada URL guarda los validadores que envió el servidor y el resultado
+    ya procesado (el feed parseado o la imagen encontrada). En la siguiente
+    ejecución se mandan If-None-Match / If-Modified-Since y, si el servidor
+    responde 304, se reutiliza ese resultado sin descargar ni parsear nada.
+    El tamaño total está acotado y se desalojan primero las URLs usadas
+    hace más tiempo.
+    """
+
+    def __init__(self, path=os.path.join(CACHE_DIR, "http"), max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(path, "index.json")
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._index = {}
+
+    def _value_path(self, url):
+        return os.path.join(self.path, generate_id(url) + ".pickle")
+
+    def headers(self, url):
+        """
+        Devuelve los headers condicionales para pedir una URL.
+
+        Args:
+            url (str): La URL que se va a pedir.
+
+        Returns:
+            dict: If-None-Match / If-Modified-Since, o un dict vacío.
+        """
+        with self._lock:
+            record = self._index.get(url)
+        if not record:
+            return {}
+        headers = {}
+        if record.get("etag"):
+            headers["If-None-Match"] = record["etag"]
+        if record.get("last_modified"):
+            headers["If-Modified-Since"] = record["last_modified"]
+        return headers
+
+    def load(self, url):
+        """
+        Recupera el resultado guardado para una URL tras recibir un 304.
+
+        Args:
+            url (str): La URL pedida.
+
+        Returns:
+            tuple: (encontrado, valor). `encontrado` es False si no hay nada
+            guardado o el archivo no se puede leer.
+        """
+        with self._lock:
+            record = self._index.get(url)
+            if not record:
+                return False, None
+            record["used"] = time.time()
+        try:
+            with open(self._value_path(url), "rb") as f:
+                return True, pickle.load(f)
+        except Exception:
+            self.forget(url)
+            return False, None
+
+    def store(self, url, response, value):
+        """
+        Guarda el resultado de una respuesta 200 si trae validadores.
+
+        Args:
+            url (str): La URL pedida.
+            response (requests.Response): La respuesta del servidor.
+            value: El resultado ya procesado que se reutilizará tras un 304.
+        """
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            self.forget(url)
+            return
+        os.makedirs(self.path, exist_ok=True)
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(self._value_path(url), "wb") as f:
+            f.write(data)
+        with self._lock:
+            self._index[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "size": len(data),
+                "used": time.time(),
+            }
+
+    def forget(self, url):
+        """Elimina una URL de la caché."""
+        with self._lock:
+            if self._index.pop(url, None) is None:
+                return
+        try:
+            os.remove(self._value_path(url))
+        except FileNotFoundError:
+            pass
+
+    def save(self):
+        """
+        Aplica el límite de tamaño (LRU) y escribe el índice en disco.
+        """
+        with self._lock:
+            total = sum(record["size"] for record in self._index.values())
+            evicted = []
+            for url, record in sorted(self._index.items(), key=lambda item: item[1]["used"]):
+                if total <= self.max_bytes:
+                    break
+                total -= record["size"]
+                evicted.append(url)
+            for url in evicted:
+                del self._index[url]
+            index = dict(self._index)
+        for url in evicted:
+            try:
+                os.remove(self._value_path(url))
+            except FileNotFoundError:
+                pass
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path)
+
+class ImageCache:
+    """
+    Almacén persistente de la imagen de cada noticia, indexado por el ID
+    de la entrada (ver generate_id).
+
+    Guarda tanto la imagen encontrada como el hecho de que una página no
+    tiene imagen (caché negativa, con una vigencia más corta). Las entradas
+    caducan por TTL y, si se supera el máximo, se descartan las usadas
+    hace más tiempo (LRU).
+    """
+
+    def __init__(self, path=os.path.join(CACHE_DIR, "images.json"), ttl=IMAGE_CACHE_TTL,
+                 miss_ttl=IMAGE_CACHE_MISS_TTL, max_entries=IMAGE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._entries = {}
+
+    def _expired(self, record, now):
+        ttl = self.ttl if record["image"] else self.miss_ttl
+        return now - record["stored"] > ttl
+
+    def get(self, entry_id):
+        """
+        Busca la imagen de una entrada.
+
+        Args:
+            entry_id (str): El ID de la entrada.
+
+        Returns:
+            tuple: (encontrado, imagen). `imagen` es None si se sabe que la
+            página no tiene imagen.
+        """
+        now = time.time()
+        with self._lock:
+            record = self._entries.get(entry_id)
+            if not record or self._expired(record, now):
+                return False, None
+            record["used"] = now
+            return True, record["image"]
+
+    def put(self, entry_id, image_url):
+        """
+        Guarda la imagen (o su ausencia) de una entrada.
+
+        Args:
+            entry_id (str): El ID de la entrada.
+            image_url (str): La imagen encontrada, o None si no hay.
+        """
+        now = time.time()
+        with self._lock:
+            self._entries[entry_id] = {"image": image_url, "stored": now, "used": now}
+
+    def stats(self):
+        """
+        Resume el contenido del almacén.
+
+        Returns:
+            dict: Total de entradas, con imagen, sin imagen y caducadas.
+        """
+        now = time.time()
+        with self._lock:
+            records = list(self._entries.values())
+        return {
+            "entries": len(records),
+            "images": sum(1 for r in records if r["image"]),
+            "misses": sum(1 for r in records if not r["image"]),
+            "expired": sum(1 for r in records if self._expired(r, now)),
+        }
+
+    def purge(self, expired_only=False):
+        """
+        Vacía el almacén, o solo las entradas caducadas.
+
+        Args:
+            expired_only (bool): Si es True se conservan las entradas vigentes.
+
+        Returns:
+            int: Número de entradas eliminadas.
+        """
+        now = time.time()
+        with self._lock:
+            before = len(self._entries)
+            if expired_only:
+                self._entries = {k: r for k, r in self._entries.items() if not self._expired(r, now)}
+            else:
+                self._entries = {}
+            return before - len(self._entries)
+
+    def save(self):
+        """
+        Descarta lo caducado, aplica el límite LRU y escribe el almacén en disco.
+        """
+        self.purge(expired_only=True)
+        with self._lock:
+            if len(self._entries) > self.max_entries:
+                recent = sorted(self._entries.items(), key=lambda item: item[1]["used"], reverse=True)
+                self._entries = dict(recent[:self.max_entries])
+            entries = dict(self._entries)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+class HeadImageParser(HTMLParser):
+    """
+    Tokenizador incremental que busca la imagen de una página en su <head>.
+
+    Replica la búsqueda de BeautifulSoup que se usaba antes: la primera
+    meta og:image y, si no tiene contenido, el primer <link rel="icon">.
+    `done` pasa a True cuando ya no hace falta seguir leyendo.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.og_image = None
+        self.icon = None
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "meta" and attrs.get("property") == "og:image" and self.og_image is None:
+            self.og_image = attrs.get("content") or ""
+            # La og:image tiene prioridad: si tiene contenido no hay nada más que buscar
+            self.done = bool(self.og_image)
+        elif tag == "link" and "icon" in (attrs.get("rel") or "").split() and self.icon is None:
+            self.icon = attrs.get("href") or ""
+        elif tag == "body":
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            self.done = True
+
+    def image(self):
+        """Devuelve la imagen encontrada con la misma prioridad que antes, o None."""
+        return self.og_image or self.icon or None
+
+def find_head_image(response, max_bytes=HEAD_MAX_BYTES):
+    """
+    Lee una respuesta por bloques y busca su imagen sin descargar el cuerpo entero.
+
+    La lectura se corta al llegar a </head> (o <body>), al encontrar la
+    og:image o al superar `max_bytes`, y la conexión se cierra.
+
+    Args:
+        response (requests.Response): Respuesta pedida con stream=True.
+        max_bytes (int): Máximo de bytes a leer.
+
+    Returns:
+        str: La URL de la imagen encontrada o None.
+    """
+    parser = HeadImageParser()
+    # requests supone ISO-8859-1 si el servidor no declara charset; ahí es mejor UTF-8
+    encoding = "utf-8"
+    if "charset" in (response.headers.get("Content-Type") or "").lower() and response.encoding:
+        encoding = response.encoding
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    read = 0
+    try:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            read += len(chunk)
+            with STATS.stage("image.parse"):
+                parser.feed(decoder.decode(chunk))
+            if parser.done or read >= max_bytes:
+                break
+    finally:
+        response.close()
+        STATS.count("image.bytes", read)
+    return parser.image()
+
+# Cierre de cada elemento del feed y raíz del documento (RSS, Atom o RDF)
+FEED_ITEM_END = re.compile(rb"</(?:[\w.-]+:)?(?:item|entry)\s*>")
+FEED_ROOT = re.compile(rb"<((?:[\w.-]+:)?)(rss|feed|RDF)[\s>]")
+
+def close_feed(data, root):
+    """
+    Cierra un documento de feed recortado tras un elemento completo.
+
+    Args:
+        data (bytes): El documento recortado.
+        root (re.Match): La etiqueta raíz encontrada con FEED_ROOT.
+
+    Returns:
+        bytes: El documento con las etiquetas de cierre necesarias.
+    """
+    prefix, name = root.group(1), root.group(2)
+    if name == b"rss":
+        return data + b"</channel></" + prefix + b"rss>"
+    return data + b"</" + prefix + name + b">"
+
+def parse_feed_stream(response, max_entries=ENTRIES_PER_FEED, max_bytes=FEED_MAX_BYTES):
+    """
+    Parsea un feed leyendo solo hasta tener `max_entries` entradas.
+
+    Se cuentan los cierres de <item>/<entry> a medida que llegan los bloques;
+    al alcanzar el número pedido se parsea el documento recortado y cerrado.
+    Si ese recorte no da un feed válido se sigue leyendo hasta el final (o
+    hasta `max_bytes`) y se parsea lo descargado.
+
+    Args:
+        response (requests.Response): Respuesta pedida con stream=True.
+        max_entries (int): Entradas que se necesitan.
+        max_bytes (int): Máximo de bytes a leer.
+
+    Returns:
+        feedparser.FeedParserDict: El feed parseado.
+    """
+    # feedparser espera los headers en minúsculas, como en sus propias descargas,
+    # y la URL final para resolver los enlaces relativos
+    response_headers = {key.lower(): value for key, value in response.headers.items()}
+    response_headers.setdefault("content-location", response.url)
+
+    def parse(data):
+        with STATS.stage("feed.parse"):
+            return feedparser.parse(bytes(data), response_headers=response_headers)
+
+    data = bytearray()
+    items, scan_from, last_item_end, root = 0, 0, None, None
+    try:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            data += chunk
+            root = root or FEED_ROOT.search(data)
+            for match in FEED_ITEM_END.finditer(data, scan_from):
+                items += 1
+                last_item_end = match.end()
+                if items == max_entries and root:
+                    feed = parse(close_feed(data[:last_item_end], root))
+                    if not feed.bozo and len(feed.entries) >= max_entries:
+                        return feed
+            # Se solapa un poco por si un cierre queda partido entre dos bloques,
+            # sin volver a contar el último cierre encontrado
+            scan_from = max(scan_from, last_item_end or 0, len(data) - 64)
+            if len(data) >= max_bytes:
+                logging.warning(f"⚠️ Feed recortado a {max_bytes} bytes: {response.url}")
+                if root and last_item_end:
+                    return parse(close_feed(data[:last_item_end], root))
+                break
+    finally:
+        response.close()
+        STATS.count("feed.bytes", len(data))
+    return parse(data)
+
+class EntryStore:
+    """
+    Almacén SQLite de las noticias ya procesadas, indexado por generate_id(link).
+
+    Para cada noticia guarda el diccionario final (contenido sanitizado,
+    resumen, imagen...) junto con un hash de la entrada original del feed,
+    de modo que una entrada que no ha cambiado no se vuelve a procesar.
+    También sirve de histórico: las noticias que salen de su feed se siguen
+    publicando durante ARCHIVE_DAYS días.
+    """
+
+    def __init__(self, path=ENTRY_STORE_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                data TEXT NOT NULL,
+                published TEXT,
+                last_seen REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_seen ON entries (last_seen);
+            CREATE TABLE IF NOT EXISTS sanitized (
+                key TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+
+    def get(self, entry_id):
+        """
+        Busca una noticia guardada.
+
+        Args:
+            entry_id (str): El ID de la noticia.
+
+        Returns:
+            tuple: (hash, noticia), o (None, None) si no existe.
+        """
+        row = self.connection.execute(
+            "SELECT hash, data FROM entries WHERE id = ?", (entry_id,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else (None, None)
+
+    def put(self, entry, entry_hash, seen):
+        """
+        Guarda o actualiza una noticia.
+
+        Args:
+            entry (dict): La noticia ya procesada.
+            entry_hash (str): El hash de la entrada original (ver entry_digest).
+            seen (float): Momento en que se vio en su feed.
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO entries (id, hash, data, published, last_seen) VALUES (?, ?, ?, ?, ?)",
+            (entry["id"], entry_hash, json.dumps(entry, ensure_ascii=False), entry["published"], seen))
+
+    def touch(self, entry_ids, seen):
+        """Marca como vistas en esta ejecución las noticias indicadas."""
+        self.connection.executemany(
+            "UPDATE entries SET last_seen = ? WHERE id = ?", [(seen, entry_id) for entry_id in entry_ids])
+
+    def archive(self, since, limit):
+        """
+        Devuelve las noticias vistas desde un momento dado, de la más reciente a la más antigua.
+
+        Args:
+            since (float): Momento mínimo de la última vez que se vio la noticia.
+            limit (int): Máximo de noticias a devolver.
+
+        Returns:
+            list: Las noticias guardadas.
+        """
+        rows = self.connection.execute(
+            "SELECT data FROM entries WHERE last_seen >= ? ORDER BY published DESC, id LIMIT ?",
+            (since, limit))
+        return [json.loads(row[0]) for row in rows]
+
+    def get_sanitized(self, keys):
+        """
+        Busca resultados de sanitización memorizados (ver Sanitizer).
+
+        Args:
+            keys (list): Claves de memoización.
+
+        Returns:
+            dict: Clave -> (contenido sanitizado, resumen) de las encontradas.
+        """
+        found = {}
+        keys = list(keys)
+        # SQLite limita el número de parámetros por consulta
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT key, content, summary FROM sanitized WHERE key IN ({','.join('?' * len(batch))})",
+                batch)
+            found.update((key, (content, summary)) for key, content, summary in rows)
+        self.connection.executemany(
+            "UPDATE sanitized SET last_used = ? WHERE key = ?", [(time.time(), key) for key in found])
+        return found
+
+    def put_sanitized(self, results):
+        """
+        Memoriza resultados de sanitización.
+
+        Args:
+            results (dict): Clave -> (contenido sanitizado, resumen).
+        """
+        now = time.time()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO sanitized (key, content, summary, last_used) VALUES (?, ?, ?, ?)",
+            [(key, content, summary, now) for key, (content, summary) in results.items()])
+
+    def prune(self, before):
+        """
+        Elimina las noticias (y sanitizaciones memorizadas) sin usar desde antes de un momento dado.
+
+        Returns:
+            int: Número de noticias eliminadas.
+        """
+        self.connection.execute("DELETE FROM sanitized WHERE last_used < ?", (before,))
+        return self.connection.execute("DELETE FROM entries WHERE last_seen < ?", (before,)).rowcount
+
+    def get_meta(self, key):
+        """Devuelve un valor auxiliar guardado, o None."""
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        """Guarda un valor auxiliar (por ejemplo, el hash de la última compilación)."""
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def save(self):
+        """Confirma los cambios pendientes sin cerrar la base de datos."""
+        self.connection.commit()
+
+    def close(self):
+        """Confirma los cambios y cierra la base de datos."""
+        self.save()
+        self.connection.close()
 
 # --- Funciones de Lógica ---
-def extract_image(url):
+def extract_image(url, session=None, cache=None, image_cache=None):
     """
     Intenta extraer la URL de una imagen destacada de una página web.
     
     Args:
         url (str): La URL de la página web.
+        session (requests.Session): Sesión a reutilizar. Si es None se usa
+            una petición suelta.
+        cache (HttpCache): Caché HTTP condicional opcional.
+        image_cache (ImageCache): Almacén de imágenes por ID de entrada. Si se
+            indica, la página solo se descarga cuando no hay nada vigente.
 
     Returns:
         str: La URL de la imagen encontrada o None si no se encuentra.
     """
+    if image_cache:
+        found, image_url = image_cache.get(generate_id(url))
+        if found:
+            STATS.count("image.cache_hits")
+            return image_url
+    start = time.perf_counter()
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        soup = BeautifulSoup(response.content, "html.parser")
-        
-        # Intentar extraer de la meta tag
-        image = soup.find("meta", property="og:image")
-        if image and image.get("content"):
-            return image["content"]
-        
-        # Intentar extraer del icono del sitio
-        icon = soup.find("link", rel="icon")
-        if icon and icon.get("href"):
-            return icon["href"]
+        http = session or requests
+        headers = dict(HEADERS, **cache.headers(url)) if cache else HEADERS
+        response = http.get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True)
+        if cache and response.status_code == 304:
+            response.close()
+            found, image_url = cache.load(url)
+            STATS.count("http.not_modified")
+            if found:
+                if image_cache:
+                    image_cache.put(generate_id(url), image_url)
+                return image_url
+            response = http.get(url, headers=HEADERS, timeout=REQUEST_TIMEOUT, stream=True)
+
+        # Solo se lee el <head>: meta og:image o, en su defecto, el icono del sitio
+        image_url = find_head_image(response)
+
+        if cache and response.status_code == 200:
+            cache.store(url, response, image_url)
+        # Solo se recuerda una respuesta válida; los errores se reintentan
+        if image_cache and response.status_code == 200:
+            image_cache.put(generate_id(url), image_url)
+        return image_url
             
     except Exception as e:
+        STATS.count("image.errors")
         logging.warning(f"⚠️ Error extrayendo imagen de {url}: {e}")
+    finally:
+        STATS.add("image.fetch", time.perf_counter() - start)
     return None
 
 def extract_content(entry):
@@ -109,6 +912,167 @@ def extract_summary_text(html):
     text = soup.get_text().strip()
     return text[:300] + "..." if len(text) > 300 else text
 
+# Etiquetas y referencias tal como las serializa bleach
+SANITIZED_TAG = re.compile(r"""(<(?:[^>"']|"[^"]*"|'[^']*')*>)""")
+# Etiquetas dentro de las que BeautifulSoup conserva los espacios tal cual
+PRESERVE_WHITESPACE_TAG = re.compile(r"<(/?)(?:pre|textarea)[\s/>]", re.IGNORECASE)
+ASCII_SPACES = " \n\t\x0c\r"
+SANITIZED_REF = re.compile(r"&(?:#([0-9]+)|#([xX][0-9a-fA-F]+)|([a-zA-Z][a-zA-Z0-9]*));")
+
+def _decode_ref(match):
+    """Decodifica una referencia igual que el parser html.parser de BeautifulSoup."""
+    decimal, hexadecimal, name = match.groups()
+    if name:
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        return character if character is not None else "&" + name
+    code = int(decimal) if decimal else int(hexadecimal[1:], 16)
+    data = None
+    if code < 256:
+        try:
+            data = bytearray([code]).decode("windows-1252")
+        except UnicodeDecodeError:
+            pass
+    if not data:
+        try:
+            data = chr(code)
+        except (ValueError, OverflowError):
+            pass
+    return data or "\N{REPLACEMENT CHARACTER}"
+
+def summary_from_sanitized(html):
+    """
+    Crea el mismo resumen que extract_summary_text, pero aprovechando que
+    el HTML ya viene serializado por bleach: basta con quitar las etiquetas
+    y decodificar las referencias, sin construir un árbol.
+
+    Como hace BeautifulSoup, un texto formado solo por espacios se reduce
+    a "\n" (si tiene algún salto de línea) o a " ", salvo dentro de <pre>.
+
+    Si aparece algo que no encaja con esa forma (un & suelto, un < sin
+    cerrar...) se recurre a extract_summary_text para no cambiar el resultado.
+
+    Args:
+        html (str): Contenido devuelto por bleach.clean.
+
+    Returns:
+        str: El resumen de texto.
+    """
+    parts = []
+    preserve = 0
+    pieces = SANITIZED_TAG.split(html)
+    # Con el grupo de captura, los textos quedan en posiciones pares y las etiquetas en impares
+    for n in range(0, len(pieces), 2):
+        segment = pieces[n]
+        if "<" in segment or "&" in SANITIZED_REF.sub("", segment):
+            return extract_summary_text(html)
+        segment = SANITIZED_REF.sub(_decode_ref, segment)
+        if segment and not preserve and not segment.strip(ASCII_SPACES):
+            segment = "\n" if "\n" in segment else " "
+        parts.append(segment)
+        tag = PRESERVE_WHITESPACE_TAG.match(pieces[n + 1]) if n + 1 < len(pieces) else None
+        if tag:
+            preserve = max(0, preserve - 1) if tag.group(1) else preserve + 1
+    text = "".join(parts).strip()
+    return text[:300] + "..." if len(text) > 300 else text
+
+def sanitize_timed(html):
+    """
+    Sanitiza un contenido HTML, extrae su resumen y mide cada paso.
+
+    Devuelve los tiempos en lugar de registrarlos porque puede ejecutarse
+    en otro proceso, donde STATS no es el de la ejecución principal.
+
+    Args:
+        html (str): El contenido original de la entrada.
+
+    Returns:
+        tuple: ((contenido sanitizado, resumen), segundos de bleach.clean,
+        segundos del resumen).
+    """
+    start = time.perf_counter()
+    # Sanitizar el contenido para prevenir XSS
+    sanitized_content = bleach.clean(
+        html,
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRS,
+        strip=True
+    )
+    cleaned = time.perf_counter()
+    summary_text = summary_from_sanitized(sanitized_content)
+    return (sanitized_content, summary_text), cleaned - start, time.perf_counter() - cleaned
+
+def sanitize_html(html):
+    """
+    Sanitiza un contenido HTML y extrae su resumen.
+
+    Args:
+        html (str): El contenido original de la entrada.
+
+    Returns:
+        tuple: (contenido sanitizado, resumen de texto).
+    """
+    return sanitize_timed(html)[0]
+
+class Sanitizer:
+    """
+    Etapa de sanitización por lotes.
+
+    Memoriza el resultado por hash del contenido original más la lista de
+    etiquetas permitidas, así que un contenido ya visto no se vuelve a
+    limpiar. Los que faltan se reparten en un pool de procesos cuando el
+    lote es lo bastante grande. Con un EntryStore la memoria persiste
+    entre ejecuciones.
+    """
+
+    def __init__(self, entry_store=None, processes=SANITIZE_PROCESSES, pool_min=SANITIZE_POOL_MIN):
+        self.entry_store = entry_store
+        self.processes = processes
+        self.pool_min = pool_min
+        self._memo = {}
+
+    @staticmethod
+    def key(html):
+        """Clave de memoización de un contenido."""
+        return hashlib.sha256((SANITIZE_SIGNATURE + html).encode("utf-8")).hexdigest()
+
+    def run(self, contents):
+        """
+        Sanitiza un lote de contenidos.
+
+        Args:
+            contents (list): Contenidos HTML originales.
+
+        Returns:
+            list: Tuplas (contenido sanitizado, resumen) en el mismo orden.
+        """
+        keys = [self.key(html) for html in contents]
+        if self.entry_store:
+            pending = [key for key in set(keys) if key not in self._memo]
+            self._memo.update(self.entry_store.get_sanitized(pending))
+
+        misses = {}
+        for key, html in zip(keys, contents):
+            if key not in self._memo:
+                misses[key] = html
+        if misses:
+            if self.processes > 1 and len(misses) >= self.pool_min:
+                with ProcessPoolExecutor(max_workers=self.processes) as pool:
+                    timed = list(pool.map(sanitize_timed, misses.values(),
+                                          chunksize=max(1, len(misses) // (self.processes * 4))))
+            else:
+                timed = [sanitize_timed(html) for html in misses.values()]
+            results = []
+            for result, clean_seconds, summary_seconds in timed:
+                STATS.add("sanitize.clean", clean_seconds)
+                STATS.add("sanitize.summary", summary_seconds)
+                results.append(result)
+            fresh = dict(zip(misses, results))
+            self._memo.update(fresh)
+            if self.entry_store:
+                self.entry_store.put_sanitized(fresh)
+        STATS.count("sanitize.memo_hits", len(keys) - len(misses))
+        return [self._memo[key] for key in keys]
+
 def generate_id(link):
     """
     Genera un ID único y determinista para una entrada usando su URL.
@@ -121,107 +1085,952 @@ def generate_id(link):
     """
     return hashlib.md5(link.encode('utf-8')).hexdigest()
 
-def process_feeds():
+def fetch_feed(url, session, cache=None, max_entries=ENTRIES_PER_FEED):
+    """
+    Descarga y parsea un feed usando la sesión compartida.
+
+    Args:
+        url (str): La URL del feed.
+        session (requests.Session): Sesión con el pool de conexiones.
+        cache (HttpCache): Caché HTTP condicional opcional.
+        max_entries (int): Entradas que se necesitan del feed.
+
+    Returns:
+        feedparser.FeedParserDict: El feed parseado, o None si falló.
+    """
+    logging.info(f"📡 Leyendo feed: {url}")
+    # El feed guardado está recortado a max_entries, así que forma parte de la clave
+    cache_key = f"{url}#{max_entries}"
+    start = time.perf_counter()
+    try:
+        headers = cache.headers(cache_key) if cache else {}
+        response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True)
+        if cache and response.status_code == 304:
+            response.close()
+            found, feed = cache.load(cache_key)
+            STATS.count("http.not_modified")
+            if found:
+                logging.info(f"♻️ Feed sin cambios (304): {url}")
+                return feed
+            response = session.get(url, timeout=REQUEST_TIMEOUT, stream=True)
+        if not response.ok:
+            response.close()
+        response.raise_for_status()
+        feed = parse_feed_stream(response, max_entries=max_entries)
+
+        if feed.bozo:
+            logging.warning(f"⚠️ Error al parsear feed {url}: {feed.bozo_exception}")
+            return None
+        if cache:
+            cache.store(cache_key, response, feed)
+        return feed
+    except requests.exceptions.RequestException as e:
+        STATS.count("feed.errors")
+        logging.error(f"❌ Error de red al acceder a {url}: {e}")
+    except Exception as e:
+        STATS.count("feed.errors")
+        logging.error(f"❌ Error inesperado al procesar {url}: {e}")
+    finally:
+        STATS.add("feed.fetch", time.perf_counter() - start)
+    return None
+
+def entry_digest(entry):
+    """
+    Calcula un hash de la entrada original del feed para detectar cambios.
+
+    Incluye la huella de la sanitización (SANITIZE_SIGNATURE), de modo que
+    si cambian las etiquetas permitidas o SANITIZE_VERSION todas las
+    noticias se vuelven a procesar.
+
+    Args:
+        entry (dict): La entrada del feed.
+
+    Returns:
+        str: El hash SHA-256 en hexadecimal.
+    """
+    date = entry.get("published_parsed") or entry.get("updated_parsed")
+    raw = [
+        entry.get("title"), entry.get("link"), extract_content(entry),
+        list(date[:6]) if date else None, SANITIZE_SIGNATURE,
+    ]
+    return hashlib.sha256(json.dumps(raw, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def build_entry(entry, image_url, sanitized=None):
+    """
+    Construye el diccionario final de una noticia a partir de la entrada del feed.
+
+    Args:
+        entry (dict): La entrada del feed.
+        image_url (str): La imagen extraída de la página del artículo, o None.
+        sanitized (tuple): (contenido, resumen) ya calculados por Sanitizer.
+            Si es None se sanitiza aquí.
+
+    Returns:
+        dict: La noticia lista para serializar.
+    """
+    full_content, has_full_content = extract_content(entry)
+    sanitized_content, summary_text = sanitized or sanitize_html(full_content)
+
+    image = image_url if image_url and image_url.strip() else FALLBACK_IMAGE
+    date = entry.get("published_parsed") or entry.get("updated_parsed")
+    iso_date = datetime(*date[:6]).isoformat() if date else None
+
+    return {
+        "id": generate_id(entry.link),
+        "title": entry.title,
+        "link": entry.link,
+        "image": image,
+        "summary": summary_text,
+        "content": sanitized_content,
+        "published": iso_date,
+        "has_full_content": has_full_content
+    }
+
+def read_feed_urls(path="feeds.txt"):
+    """
+    Lee la lista de feeds, una URL por línea.
+
+    Returns:
+        list: Las URLs en orden, o None si el fichero no existe.
+    """
+    try:
+        with open(path, "r") as file:
+            return [line.strip() for line in file if line.strip()]
+    except FileNotFoundError:
+        logging.error(f"❌ {path} no encontrado.")
+        return None
+
+def process_feeds(max_workers=MAX_WORKERS, max_per_host=MAX_PER_HOST, http_cache=None,
+                  image_cache=None, entry_store=None, entries_per_feed=ENTRIES_PER_FEED,
+                  archive_days=ARCHIVE_DAYS, session=None, poll=None,
+                  feed_state=None, fetched=None):
     """
     Lee las URLs de los feeds, procesa las entradas y devuelve una lista unificada.
-    
+
+    Los feeds y las páginas de los artículos se descargan en paralelo con un
+    pool de hilos acotado, pero el resultado se ensambla siempre en el orden
+    de feeds.txt, así que la salida es idéntica a la de una ejecución en serie.
+
+    Con un EntryStore solo se procesan las entradas nuevas o modificadas (las
+    demás se toman tal cual del almacén, sin descargar su página) y se añaden
+    las noticias vistas en los últimos `archive_days` días.
+
+    Args:
+        max_workers (int): Peticiones simultáneas en total.
+        max_per_host (int): Peticiones simultáneas contra un mismo host.
+        http_cache (HttpCache): Caché HTTP condicional opcional.
+        image_cache (ImageCache): Almacén opcional de imágenes por entrada.
+        entry_store (EntryStore): Almacén opcional de noticias procesadas.
+        entries_per_feed (int): Entradas que se toman de cada feed.
+        archive_days (int): Días que se siguen publicando las noticias
+            que ya salieron de su feed (solo con entry_store).
+        session (requests.Session): Sesión a reutilizar; si no se da, se
+            crea una para esta llamada y se cierra al terminar.
+        poll (iterable): URLs que se descargan; las demás se toman de
+            `feed_state` (o se omiten si no tienen versión guardada, como
+            un feed que aún no ha respondido nunca). Si es None se
+            descargan todas.
+        feed_state (dict): Último feed leído de cada URL. Se actualiza con
+            lo descargado, y si un feed falla se publica su versión anterior.
+        fetched (dict): Si se da, se rellena con el resultado de cada feed
+            descargado (None si falló).
+
     Returns:
         list: Una lista de diccionarios, cada uno representando una noticia.
     """
     all_entries = []
 
-    try:
-        with open("feeds.txt", "r") as file:
-            urls = [line.strip() for line in file if line.strip()]
-    except FileNotFoundError:
-        logging.error("❌ feeds.txt no encontrado.")
+    urls = read_feed_urls()
+    if urls is None:
         return []
 
-    for url in urls:
-        logging.info(f"📡 Leyendo feed: {url}")
-        try:
-            feed = feedparser.parse(url, request_headers=HEADERS)
-            
-            if feed.bozo:
-                logging.warning(f"⚠️ Error al parsear feed {url}: {feed.bozo_exception}")
+    own_session = session is None
+    session = session or create_session(pool_size=max_per_host, max_workers=max_workers)
+    state = feed_state if feed_state is not None else {}
+    poll = set(urls) if poll is None else set(poll)
+
+    def request(dispatcher, func, url, *args):
+        """Programa una descarga respetando el límite por host."""
+        return dispatcher.submit(url, func, url, session, http_cache, *args)
+
+    feeds = [None if url in poll else state.get(url) for url in urls]
+    images = {}
+    unchanged = {}
+
+    def queue_images(dispatcher, i):
+        """Encola la extracción de imagen de las entradas nuevas o modificadas del feed i."""
+        for j, entry in enumerate(feeds[i].entries[:entries_per_feed]):
+            link = entry.get("link")
+            if not link:
                 continue
-            
-            for entry in feed.entries[:5]: 
-                # --- CORRECCIÓN AQUÍ: Llamamos a la función solo una vez ---
-                full_content, has_full_content = extract_content(entry)
-                
-                # Sanitizar el contenido para prevenir XSS
-                sanitized_content = bleach.clean(
-                    full_content,
-                    tags=ALLOWED_TAGS,
-                    attributes=ALLOWED_ATTRS,
-                    strip=True
-                )
-                
-                # Extraemos el resumen del contenido sanitizado
-                summary_text = extract_summary_text(sanitized_content)
-
-                image_url = extract_image(entry.link)
-                image = image_url if image_url and image_url.strip() else 'assets/img/fallback.jpg'
-                date = entry.get("published_parsed") or entry.get("updated_parsed")
-                iso_date = datetime(*date[:6]).isoformat() if date else None
-
-                all_entries.append({
-                    "id": generate_id(entry.link),
-                    "title": entry.title,
-                    "link": entry.link,
-                    "image": image,
-                    "summary": summary_text,
-                    "content": sanitized_content,
-                    "published": iso_date,
-                    "has_full_content": has_full_content
-                })
-        except requests.exceptions.RequestException as e:
-            logging.error(f"❌ Error de red al acceder a {url}: {e}")
+            if entry_store:
+                stored_hash, stored = entry_store.get(generate_id(link))
+                # Una noticia sin cambios se reutiliza, salvo que se quedara sin imagen
+                if stored_hash == entry_digest(entry) and stored["image"] != FALLBACK_IMAGE:
+                    unchanged[(i, j)] = stored
+                    continue
+            images[(i, j)] = request(dispatcher, extract_image, link, image_cache)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            dispatcher = HostDispatcher(pool, max_per_host)
+            feed_futures = {
+                request(dispatcher, fetch_feed, url, entries_per_feed): i
+                for i, url in enumerate(urls) if url in poll
+            }
+            # Los feeds que no toca descargar ya están en memoria
+            for i, url in enumerate(urls):
+                if url not in poll and feeds[i] is not None:
+                    queue_images(dispatcher, i)
+            # En cuanto llega un feed se encolan sus artículos, sin esperar al resto
+            for future in as_completed(feed_futures):
+                i = feed_futures[future]
+                feeds[i] = future.result()
+                if fetched is not None:
+                    fetched[urls[i]] = feeds[i]
+                if feeds[i] is None:
+                    feeds[i] = state.get(urls[i])
+                else:
+                    state[urls[i]] = feeds[i]
+                if feeds[i] is not None:
+                    queue_images(dispatcher, i)
+            images = {key: future.result() for key, future in images.items()}
+    finally:
+        if own_session:
+            session.close()
+
+    now = time.time()
+    # Sanitización de todas las entradas nuevas en un solo lote
+    pending = {}
+    for i, feed in enumerate(feeds):
+        for j, entry in enumerate(feed.entries[:entries_per_feed] if feed else []):
+            if (i, j) not in unchanged:
+                try:
+                    pending[(i, j)] = extract_content(entry)[0]
+                except Exception:
+                    pass  # build_entry volverá a fallar y lo registrará con su feed
+    sanitized = dict(zip(pending, Sanitizer(entry_store).run(list(pending.values()))))
+
+    for i, url in enumerate(urls):
+        if feeds[i] is None:
+            continue
+        try:
+            for j, entry in enumerate(feeds[i].entries[:entries_per_feed]):
+                if (i, j) in unchanged:
+                    all_entries.append(dict(unchanged[(i, j)], feed=url))
+                    continue
+                news = build_entry(entry, images.get((i, j)), sanitized.get((i, j)))
+                news["feed"] = url
+                all_entries.append(news)
+                if entry_store:
+                    entry_store.put(news, entry_digest(entry), now)
         except Exception as e:
             logging.error(f"❌ Error inesperado al procesar {url}: {e}")
 
+    if entry_store:
+        entry_store.touch([news["id"] for news in unchanged.values()], now)
+        since = now - archive_days * 24 * 3600
+        entry_store.prune(since)
+        if archive_days:
+            current_ids = {news["id"] for news in all_entries}
+            archived = entry_store.archive(since, ARCHIVE_MAX_ENTRIES)
+            archived = [news for news in archived if news["id"] not in current_ids]
+            all_entries += archived[:max(0, ARCHIVE_MAX_ENTRIES - len(all_entries))]
+        logging.info(f"🗃️ {len(unchanged)} noticias sin cambios, {len(all_entries) - len(unchanged)} nuevas o del histórico.")
+
+    STATS.count("feeds", len(urls))
+    STATS.count("feeds.polled", len(feed_futures))
+    STATS.count("entries.unchanged", len(unchanged))
+    STATS.count("entries.built", len(pending))
+    STATS.count("entries.published", len(all_entries))
+
     all_entries.sort(key=lambda x: x["published"] or "", reverse=True)
     return all_entries
 
-def main():
+def write_if_changed(path, data):
+    """
+    Escribe un archivo solo si su contenido cambia.
+
+    Args:
+        path (str): Ruta del archivo.
+        data (bytes): El contenido.
+
+    Returns:
+        bool: True si se escribió el archivo.
+    """
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return True
+
+def precompress(path, data):
+    """
+    Escribe las versiones precomprimidas (.gz y, si hay brotli, .br) de un archivo,
+    para los hosts estáticos que las sirven directamente.
+
+    Args:
+        path (str): Ruta del archivo original.
+        data (bytes): Su contenido.
+    """
+    # mtime=0 para que el .gz no cambie si no cambia el contenido
+    write_if_changed(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli:
+        write_if_changed(path + ".br", brotli.compress(data))
+
+def write_artifact(path, data):
+    """
+    Escribe un archivo de salida y, si es de texto, sus versiones precomprimidas.
+
+    Args:
+        path (str): Ruta del archivo.
+        data (bytes): El contenido.
+
+    Returns:
+        bool: True si el archivo cambió.
+    """
+    changed = write_if_changed(path, data)
+    if changed:
+        STATS.count("output.files_written")
+        STATS.count("output.bytes_written", len(data))
+    if path.endswith(COMPRESSED_EXTENSIONS) and (changed or not os.path.exists(path + ".gz")):
+        precompress(path, data)
+    return changed
+
+def compact_json(value):
+    """Serializa a JSON compacto en UTF-8."""
+    with STATS.stage("json.dump"):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def paginate(items, page_size=PAGE_SIZE):
+    """
+    Divide una lista en páginas. Siempre devuelve al menos una página.
+
+    Args:
+        items (list): Los elementos.
+        page_size (int): Elementos por página.
+
+    Returns:
+        list: Lista de páginas.
+    """
+    return [items[n:n + page_size] for n in range(0, len(items), page_size)] or [[]]
+
+def page_path(number):
+    """Ruta relativa a dist/ de la página HTML número `number` (empezando en 1)."""
+    return "index.html" if number == 1 else f"page/{number}.html"
+
+def remove_stale(directory, keep):
+    """
+    Borra de un directorio de salida los archivos que ya no se generan
+    (páginas o fragmentos sobrantes de una ejecución anterior con más noticias).
+
+    Args:
+        directory (str): Directorio a limpiar.
+        keep (set): Rutas que se acaban de generar, sin sus .gz/.br.
+    """
+    for folder, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(folder, name)
+            base = path[:-3] if path.endswith((".gz", ".br")) else path
+            if base not in keep:
+                os.remove(path)
+
+def tokenize(text):
+    """
+    Separa un texto en términos de búsqueda: minúsculas, sin tildes y sin
+    palabras vacías. main.js normaliza las consultas de la misma forma.
+
+    Args:
+        text (str): El texto.
+
+    Returns:
+        list: Los términos, sin repetir y en orden de aparición.
+    """
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    terms = re.findall(r"[^\W_]+", text)
+    return list(dict.fromkeys(t for t in terms if len(t) > 1 and t not in SEARCH_STOPWORDS))
+
+def build_search_index(news_entries, page_size=PAGE_SIZE):
+    """
+    Construye un índice invertido de títulos y resúmenes para la búsqueda en el navegador.
+
+    Las listas de cada término guardan ordinales de noticia (su posición en
+    `docs`), de modo que el cliente solo tiene que intersecarlas.
+
+    Args:
+        news_entries (list): Las noticias ya ordenadas.
+        page_size (int): Noticias por página, para enlazar a la página de cada resultado.
+
+    Returns:
+        dict: {"page_size", "stopwords", "docs": [[id, título, enlace]],
+        "terms": {término: [ordinales]}}.
+    """
+    terms = {}
+    for ordinal, news in enumerate(news_entries):
+        for term in tokenize(f"{news['title']} {news['summary']}"):
+            terms.setdefault(term, []).append(ordinal)
+    return {
+        "page_size": page_size,
+        "stopwords": sorted(SEARCH_STOPWORDS),
+        "docs": [[news["id"], news["title"], news["link"]] for news in news_entries],
+        "terms": dict(sorted(terms.items())),
+    }
+
+def write_fragments(news_entries, dist=DIST_DIR):
+    """
+    Escribe el contenido completo de cada noticia en dist/content/<id>.html,
+    para que main.js lo cargue solo cuando se abre su "Leer más".
+
+    Args:
+        news_entries (list): Las noticias.
+        dist (str): Carpeta de salida.
+    """
+    content_dir = os.path.join(dist, "content")
+    written = set()
+    for news in news_entries:
+        if news["has_full_content"]:
+            path = os.path.join(content_dir, news["id"] + ".html")
+            write_artifact(path, news["content"].encode("utf-8"))
+            written.add(path)
+    remove_stale(content_dir, written)
+
+def write_data(news_entries, dist=DIST_DIR, page_size=PAGE_SIZE):
+    """
+    Escribe los datos en JSON compacto: news.json completo y, en dist/data/,
+    fragmentos por página y por feed, el índice de búsqueda y un
+    manifest.json que los enumera.
+
+    Args:
+        news_entries (list): Las noticias ya ordenadas.
+        dist (str): Carpeta de salida.
+        page_size (int): Noticias por fragmento.
+
+    Returns:
+        dict: El manifest escrito.
+    """
+    data_dir = os.path.join(dist, "data")
+    written = set()
+
+    def shard(relative, entries):
+        path = os.path.join(data_dir, relative)
+        write_artifact(path, compact_json(entries))
+        written.add(path)
+        return "data/" + relative
+
+    pages = [shard(f"page-{n}.json", page) for n, page in enumerate(paginate(news_entries, page_size), 1)]
+    by_feed = {}
+    for news in news_entries:
+        by_feed.setdefault(news.get("feed") or "", []).append(news)
+    feeds = []
+    for url, entries in by_feed.items():
+        feed_id = generate_id(url)
+        feeds.append({
+            "id": feed_id,
+            "url": url,
+            "total": len(entries),
+            "pages": [shard(f"feeds/{feed_id}/page-{n}.json", page)
+                      for n, page in enumerate(paginate(entries, page_size), 1)],
+        })
+
+    search_path = os.path.join(data_dir, "search.json")
+    write_artifact(search_path, compact_json(build_search_index(news_entries, page_size)))
+    written.add(search_path)
+
+    manifest = {
+        "total": len(news_entries), "page_size": page_size, "pages": pages, "feeds": feeds,
+        "search": "data/search.json",
+    }
+    manifest_path = os.path.join(data_dir, "manifest.json")
+    write_artifact(manifest_path, compact_json(manifest))
+    written.add(manifest_path)
+    remove_stale(data_dir, written)
+
+    if write_artifact(os.path.join(dist, "news.json"), compact_json(news_entries)):
+        logging.info("✅ news.json y fragmentos JSON generados.")
+    else:
+        logging.info("⏭️ news.json sin cambios.")
+    return manifest
+
+def make_variant(data, max_width, image_format, quality):
+    """
+    Reduce y vuelve a codificar una imagen.
+
+    Args:
+        data (bytes): La imagen original.
+        max_width (int): Ancho máximo en píxeles.
+        image_format (str): Formato de salida para Pillow ("JPEG", "WEBP"...).
+        quality (int): Calidad de compresión.
+
+    Returns:
+        bytes: La imagen reducida.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        if image.width > max_width:
+            height = round(image.height * max_width / image.width)
+            image = image.resize((max_width, height), Image.LANCZOS)
+        if image_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+        output = io.BytesIO()
+        image.save(output, image_format, quality=quality, optimize=True)
+        return output.getvalue()
+
+def hashed_name(path, data, extension=None):
+    """
+    Añade al nombre de un archivo los 8 primeros caracteres del hash de su contenido.
+
+    Args:
+        path (str): Ruta original, por ejemplo "assets/css/style.css".
+        data (bytes): Contenido que se va a publicar.
+        extension (str): Extensión nueva, si el formato cambia.
+
+    Returns:
+        str: Por ejemplo "assets/css/style.1a2b3c4d.css".
+    """
+    stem, original_extension = posixpath.splitext(path)
+    digest = hashlib.sha256(data).hexdigest()[:8]
+    return f"{stem}.{digest}{extension or original_extension}"
+
+def rewrite_css_urls(css, css_path, assets):
+    """
+    Cambia las referencias url(...) de una hoja de estilos por sus versiones con hash.
+
+    Args:
+        css (str): La hoja de estilos.
+        css_path (str): Ruta original de la hoja, por ejemplo "assets/css/style.css".
+        assets (dict): Ruta original -> ruta publicada de los assets ya procesados.
+
+    Returns:
+        str: La hoja de estilos con las rutas publicadas.
+    """
+    folder = posixpath.dirname(css_path)
+
+    def replace(match):
+        quote, url = match.groups()
+        if "://" in url or url.startswith(("data:", "/", "#")):
+            return match.group(0)
+        target = assets.get(posixpath.normpath(posixpath.join(folder, url)))
+        if not target:
+            return match.group(0)
+        # La hoja publicada queda en la misma carpeta que la original
+        return f"url({quote}{posixpath.relpath(target, folder)}{quote})"
+
+    return CSS_URL.sub(replace, css)
+
+def build_assets(source=ASSETS_DIR, dist=DIST_DIR, manifest_path=ASSET_MANIFEST_PATH):
+    """
+    Publica los assets en dist/ con el hash del contenido en el nombre, para
+    poder servirlos con caché de larga duración.
+
+    Un manifiesto en .cache/ guarda el hash de cada archivo fuente: lo que no
+    ha cambiado no se vuelve a copiar ni a reducir. Las imágenes de
+    IMAGE_VARIANTS se publican reducidas (si Pillow está instalado) y las
+    hojas de estilos se reescriben para apuntar a los nombres con hash.
+    En dist/assets/manifest.json queda la correspondencia de nombres.
+
+    Args:
+        source (str): Carpeta de assets originales.
+        dist (str): Carpeta de salida.
+        manifest_path (str): Manifiesto de hashes entre ejecuciones.
+
+    Returns:
+        dict: Ruta original -> ruta publicada, ambas relativas a dist/.
+    """
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    except (FileNotFoundError, ValueError):
+        previous = {}
+
+    # Rutas lógicas ("assets/css/style.css") -> archivo en disco
+    files = {}
+    for folder, _, names in os.walk(source):
+        for name in names:
+            file_path = os.path.join(folder, name)
+            relative = os.path.relpath(file_path, source).split(os.sep)
+            files[posixpath.join(ASSETS_DIR, *relative)] = file_path
+    # Las hojas de estilos al final, cuando ya se conocen los nombres de lo que referencian
+    paths = sorted(files, key=lambda path: (path.endswith(".css"), path))
+
+    assets, manifest, written, copied = {}, {}, set(), 0
+    for path in paths:
+        with open(files[path], "rb") as f:
+            data = f.read()
+        variant = IMAGE_VARIANTS.get(path) if Image else None
+        if path.endswith(".css"):
+            data = rewrite_css_urls(data.decode("utf-8"), path, assets).encode("utf-8")
+        source_hash = hashlib.sha256(data + json.dumps(variant).encode()).hexdigest()
+
+        record = previous.get(path)
+        if record and record["hash"] == source_hash and os.path.exists(os.path.join(dist, record["output"])):
+            output = record["output"]
+        else:
+            extension = None
+            if variant:
+                data = make_variant(data, *variant)
+                extension = IMAGE_EXTENSIONS[variant[1]]
+            output = hashed_name(path, data, extension)
+            write_artifact(os.path.join(dist, output), data)
+            copied += 1
+        assets[path] = output
+        manifest[path] = {"hash": source_hash, "output": output}
+        written.add(os.path.join(dist, output))
+
+    assets_manifest = os.path.join(dist, ASSETS_DIR, "manifest.json")
+    write_artifact(assets_manifest, compact_json(assets))
+    written.add(assets_manifest)
+    remove_stale(os.path.join(dist, ASSETS_DIR), written)
+
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    logging.info(f"✅ Assets publicados en dist/ ({copied} actualizados, {len(paths) - copied} sin cambios).")
+    return assets
+
+def publish_asset_paths(news_entries, assets):
+    """
+    Sustituye en las noticias las rutas de assets locales (la imagen de
+    respaldo) por las publicadas con hash, para los datos JSON de dist/.
+
+    Args:
+        news_entries (list): Las noticias.
+        assets (dict): Ruta original -> ruta publicada, de build_assets.
+
+    Returns:
+        list: Las noticias con las rutas publicadas (copias de las que cambian).
+    """
+    return [dict(news, image=assets[news["image"]]) if news.get("image") in assets else news
+            for news in news_entries]
+
+def render_pages(env, news_entries, dist=DIST_DIR, page_size=PAGE_SIZE, assets=None):
+    """
+    Renderiza las páginas HTML desde la plantilla: index.html con las
+    primeras noticias y page/2.html, page/3.html... con el resto.
+
+    Args:
+        env (jinja2.Environment): Entorno con la plantilla index.html.
+        news_entries (list): Las noticias ya ordenadas.
+        dist (str): Carpeta de salida.
+        page_size (int): Noticias por página.
+        assets (dict): Ruta original -> ruta publicada (ver build_assets).
+    """
+    assets = assets or {}
+    template = env.get_template("index.html")
+    pages = paginate(news_entries, page_size)
+    written = set()
+    for number, page in enumerate(pages, 1):
+        # Las páginas dentro de page/ necesitan subir un nivel para llegar a assets/
+        root = "" if number == 1 else "../"
+        with STATS.stage("render"):
+            rendered_html = template.render(
+                news=page,
+                root=root,
+                asset=lambda path, root=root: root + assets.get(path, path),
+                fallback=FALLBACK_IMAGE,
+                page=number,
+                pages=len(pages),
+                prev_url=root + page_path(number - 1) if number > 1 else None,
+                next_url=root + page_path(number + 1) if number < len(pages) else None,
+            )
+        path = os.path.join(dist, page_path(number))
+        write_artifact(path, rendered_html.encode("utf-8"))
+        written.add(path)
+    remove_stale(os.path.join(dist, "page"), written)
+    logging.info(f"✅ {len(pages)} páginas HTML generadas en la carpeta dist/")
+
+def build_site(env, news_entries, page_size=PAGE_SIZE):
+    """
+    Genera dist/ a partir de las noticias: datos JSON, contenidos, assets y páginas.
+
+    Todo se regenera en cada llamada, pero write_artifact solo reescribe los
+    archivos cuyo contenido cambia, así que dist/ siempre queda completo
+    aunque se parta de una copia vieja o incompleta.
+
+    Args:
+        env (jinja2.Environment): Entorno con la plantilla index.html.
+        news_entries (list): Noticias ya ordenadas.
+        page_size (int): Noticias por página.
+    """
+    # 1. Publicar los assets con hash en el nombre (solo se copia lo que cambió)
+    with STATS.stage("assets"):
+        assets = build_assets()
+
+    # 2. Guardar los datos en JSON (completo, por página y por feed), con la
+    #    imagen de respaldo apuntando a su versión publicada
+    published = publish_asset_paths(news_entries, assets)
+    with STATS.stage("write_data"):
+        write_data(published, page_size=page_size)
+        write_fragments(published)
+
+    # 3. Renderizar las páginas desde la plantilla
+    render_pages(env, news_entries, page_size=page_size, assets=assets)
+
+# --- Modo daemon ---
+class FeedScheduler:
+    """
+    Calendario de consultas del modo daemon, con un intervalo propio por feed.
+
+    El intervalo se aprende del ritmo de publicación del feed (la mitad de
+    la separación típica entre sus entradas) y nunca baja de lo que el propio
+    feed pide con `<ttl>` o `Cache-Control: max-age`. Los fallos se reintentan
+    con espera exponencial y aleatoria, y dos consultas al mismo host quedan
+    separadas al menos `host_delay` segundos.
+    """
+
+    def __init__(self, min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL,
+                 host_delay=POLL_HOST_DELAY, jitter=POLL_JITTER, rng=None):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.host_delay = host_delay
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+        self._feeds = {}
+        self._host_last = {}
+
+    def sync(self, urls, now):
+        """Añade los feeds nuevos de la lista (pendientes ya) y olvida los retirados."""
+        for url in urls:
+            self._feeds.setdefault(url, {"next": now, "interval": None, "failures": 0, "seen": None})
+        for url in set(self._feeds) - set(urls):
+            del self._feeds[url]
+
+    def due(self, now):
+        """
+        Devuelve los feeds que toca consultar, como mucho uno por host.
+
+        Un feed cuyo host se ha consultado hace menos de `host_delay`
+        segundos se aplaza hasta que pase ese margen.
+        """
+        chosen = []
+        for url, state in sorted(self._feeds.items(), key=lambda item: item[1]["next"]):
+            if state["next"] > now:
+                break
+            host = urlsplit(url).netloc
+            ready = self._host_last.get(host, float("-inf")) + self.host_delay
+            if ready > now:
+                state["next"] = ready
+                continue
+            self._host_last[host] = now
+            chosen.append(url)
+        return chosen
+
+    def next_wakeup(self):
+        """Momento de la próxima consulta pendiente, o None si no hay feeds."""
+        return min((state["next"] for state in self._feeds.values()), default=None)
+
+    def interval(self, url):
+        """Intervalo aprendido para un feed (None si aún no se ha consultado)."""
+        return self._feeds[url]["interval"]
+
+    def record(self, url, feed, now):
+        """
+        Anota el resultado de una consulta y programa la siguiente.
+
+        Args:
+            url (str): La URL del feed.
+            feed (feedparser.FeedParserDict): El feed descargado, o None si falló.
+            now (float): Momento de la consulta.
+
+        Returns:
+            int: Entradas que no estaban en la consulta anterior.
+        """
+        state = self._feeds.setdefault(url, {"next": now, "interval": None, "failures": 0, "seen": None})
+        if feed is None:
+            state["failures"] += 1
+            backoff = min(self.max_interval, self.min_interval * 2 ** (state["failures"] - 1))
+            state["next"] = now + backoff * self.rng.uniform(0.5, 1.0)
+            return 0
+
+        seen = {generate_id(entry.link) for entry in feed.entries if entry.get("link")}
+        new = len(seen - state["seen"]) if state["seen"] is not None else len(seen)
+        state["interval"] = self.learn(feed, state["interval"], new)
+        state["failures"] = 0
+        state["seen"] = seen
+        state["next"] = now + state["interval"] * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+        return new
+
+    def learn(self, feed, previous, new):
+        """
+        Calcula el intervalo de un feed a partir de sus fechas y sus pistas de caché.
+
+        Sin fechas de publicación, el intervalo anterior se acorta a la mitad
+        si aparecieron entradas nuevas y se alarga un 50% si no.
+        """
+        published = sorted((calendar.timegm(entry.published_parsed) for entry in feed.entries
+                            if entry.get("published_parsed")), reverse=True)
+        if len(published) >= 2:
+            gaps = [newer - older for newer, older in zip(published, published[1:])]
+            interval = statistics.median(gaps) / 2
+        elif previous:
+            interval = previous / 2 if new else previous * 1.5
+        else:
+            interval = POLL_DEFAULT_INTERVAL
+
+        hints = []
+        ttl = feed.feed.get("ttl")
+        if ttl and str(ttl).strip().isdigit():
+            hints.append(int(ttl) * 60)
+        max_age = CACHE_CONTROL_MAX_AGE.search(feed.get("headers", {}).get("cache-control", ""))
+        if max_age:
+            hints.append(int(max_age.group(1)))
+        interval = max([interval] + hints)
+        return min(self.max_interval, max(self.min_interval, interval))
+
+def run_daemon(args, env, http_cache, image_cache, entry_store, scheduler=None, stop=None):
+    """
+    Mantiene el portal actualizado consultando cada feed según su calendario.
+
+    La sesión HTTP, la plantilla y los feeds ya leídos se conservan en
+    memoria entre pasadas; la primera pasada lee todos los feeds y las
+    siguientes solo los que toca. dist/ solo se regenera cuando cambian
+    las noticias publicadas.
+
+    Args:
+        args (argparse.Namespace): Las opciones de la línea de comandos.
+        env (jinja2.Environment): Entorno con la plantilla index.html.
+        http_cache (HttpCache): Caché HTTP condicional.
+        image_cache (ImageCache): Almacén de imágenes por entrada.
+        entry_store (EntryStore): Almacén de noticias procesadas.
+        scheduler (FeedScheduler): Calendario a usar (por defecto uno nuevo).
+        stop (threading.Event): Se detiene al activarse; por defecto con SIGINT/SIGTERM.
+    """
+    scheduler = scheduler or FeedScheduler()
+    if stop is None:
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+
+    session = create_session(pool_size=args.max_per_host, max_workers=args.max_workers)
+    feed_state = {}
+    published = None
+    logging.info("🛰️ Modo daemon iniciado.")
+    with session:
+        while not stop.is_set():
+            now = time.time()
+            urls = read_feed_urls()
+            if urls is not None:
+                scheduler.sync(urls, now)
+            due = scheduler.due(now) if published is not None else None
+            if published is None or due:
+                STATS.reset()
+                fetched = {}
+                with STATS.stage("process_feeds"):
+                    news_entries = process_feeds(max_workers=args.max_workers, max_per_host=args.max_per_host,
+                                                 http_cache=http_cache, image_cache=image_cache,
+                                                 entry_store=entry_store, entries_per_feed=args.entries_per_feed,
+                                                 archive_days=args.archive_days, session=session,
+                                                 poll=due, feed_state=feed_state, fetched=fetched)
+                new = sum(scheduler.record(url, feed, now) for url, feed in fetched.items())
+                http_cache.save()
+                image_cache.save()
+                if news_entries != published:
+                    build_site(env, news_entries, page_size=args.page_size)
+                    published = news_entries
+                    logging.info(f"📰 {len(fetched)} feeds consultados, {new} noticias nuevas: dist/ actualizado.")
+                else:
+                    logging.info(f"💤 {len(fetched)} feeds consultados, sin cambios.")
+                entry_store.save()
+                STATS.save(args.report)
+
+            wakeup = scheduler.next_wakeup()
+            stop.wait(max(1.0, wakeup - time.time()) if wakeup is not None else POLL_MIN_INTERVAL)
+    logging.info("🛑 Modo daemon detenido.")
+
+def positive_int(value):
+    """Tipo de argparse para enteros mayores que cero."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"debe ser mayor que cero: {value}")
+    return number
+
+def non_negative_int(value):
+    """Tipo de argparse para enteros mayores o iguales que cero."""
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"no puede ser negativo: {value}")
+    return number
+
+def parse_args(argv=None):
+    """
+    Lee las opciones de la línea de comandos.
+
+    Args:
+        argv (list): Argumentos a parsear. Si es None se usa sys.argv.
+
+    Returns:
+        argparse.Namespace: Las opciones.
+    """
+    parser = argparse.ArgumentParser(description="Genera el portal de noticias estático en dist/.")
+    parser.add_argument("--image-cache-info", action="store_true",
+                        help="muestra el estado del almacén de imágenes y termina")
+    parser.add_argument("--purge-image-cache", choices=["all", "expired"],
+                        help="vacía el almacén de imágenes (todo o solo lo caducado) y termina")
+    parser.add_argument("--max-workers", type=positive_int, default=MAX_WORKERS,
+                        help=f"peticiones simultáneas en total (por defecto {MAX_WORKERS})")
+    parser.add_argument("--max-per-host", type=positive_int, default=MAX_PER_HOST,
+                        help=f"peticiones simultáneas contra un mismo host (por defecto {MAX_PER_HOST})")
+    parser.add_argument("--entries-per-feed", type=positive_int, default=ENTRIES_PER_FEED,
+                        help=f"entradas que se toman de cada feed (por defecto {ENTRIES_PER_FEED})")
+    parser.add_argument("--page-size", type=positive_int, default=PAGE_SIZE,
+                        help=f"noticias por página y por fragmento JSON (por defecto {PAGE_SIZE})")
+    parser.add_argument("--archive-days", type=non_negative_int, default=ARCHIVE_DAYS,
+                        help=f"días que se conservan las noticias que salen de su feed (por defecto {ARCHIVE_DAYS})")
+    parser.add_argument("--report", default=RUN_REPORT_PATH,
+                        help=f"dónde escribir el informe de tiempos de la ejecución (por defecto {RUN_REPORT_PATH})")
+    parser.add_argument("--daemon", action="store_true",
+                        help="se queda en marcha consultando cada feed según su propio intervalo")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """
     Función principal para unir todo el proceso completo de generación.
+
+    Args:
+        argv (list): Argumentos de línea de comandos. Si es None se usa sys.argv.
     """
+    args = parse_args(argv)
+    image_cache = ImageCache()
+    if args.image_cache_info:
+        print(json.dumps(image_cache.stats(), indent=2))
+        return
+    if args.purge_image_cache:
+        removed = image_cache.purge(expired_only=args.purge_image_cache == "expired")
+        image_cache.save()
+        logging.info(f"🧹 {removed} entradas eliminadas del almacén de imágenes.")
+        return
+
+    STATS.reset()
     # Crear carpeta de salida si no existe
     os.makedirs("dist", exist_ok=True)
-    os.makedirs("dist/assets/css", exist_ok=True)
-    os.makedirs("dist/assets/js", exist_ok=True)
-    os.makedirs("dist/assets/img", exist_ok=True)
-    
-    news_entries = process_feeds()
     
-    # 1. Guardar como JSON
-    with open("dist/news.json", "w", encoding="utf-8") as f:
-        json.dump(news_entries, f, ensure_ascii=False, indent=2)
-    logging.info("✅ news.json generado.")
-
-    # 2. Renderizar index.html desde plantilla
+    http_cache = HttpCache()
+    entry_store = EntryStore()
     env = Environment(loader=FileSystemLoader("templates"))
-    template = env.get_template("index.html")
-
-    rendered_html = template.render(news=news_entries)
+    if args.daemon:
+        try:
+            run_daemon(args, env, http_cache, image_cache, entry_store)
+        finally:
+            entry_store.close()
+        return
 
-    with open("dist/index.html", "w", encoding="utf-8") as f:
-        f.write(rendered_html)
-    logging.info("✅ index.html generado en la carpeta dist/")
+    with STATS.stage("process_feeds"):
+        news_entries = process_feeds(max_workers=args.max_workers, max_per_host=args.max_per_host,
+                                     http_cache=http_cache, image_cache=image_cache,
+                                     entry_store=entry_store, entries_per_feed=args.entries_per_feed,
+                                     archive_days=args.archive_days)
+    http_cache.save()
+    image_cache.save()
 
-# Copiar archivos estáticos (CSS y JS) a la carpeta dist
-    logging.info("➡️ Copiando assets (CSS y JS)...")
+    build_site(env, news_entries, page_size=args.page_size)
+    entry_store.close()
 
-    # Copia tu CSS
-    shutil.copytree("assets/css", "dist/assets/css", dirs_exist_ok=True)
-    
-    # Copia tu JS
-    shutil.copytree("assets/js", "dist/assets/js", dirs_exist_ok=True)
+    STATS.save(args.report)
+    logging.info(f"⏱️ Informe de la ejecución en {args.report}")
 
-    shutil.copytree("assets/img", "dist/assets/img", dirs_exist_ok=True)
-    
-    logging.info("✅ Assets copiados a dist/")
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,7 +1,40 @@
 import unittest
 import hashlib
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import feedparser
+import gzip
+import io
+import json
+from email.utils import formatdate
+from collections import Counter
+from jinja2 import Environment, FileSystemLoader
 from unittest.mock import patch, MagicMock
-from fetch_feeds import extract_image, extract_content, generate_id
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import fetch_feeds
+from fetch_feeds import (
+    extract_image, extract_content, generate_id, process_feeds, fetch_feed,
+    HostDispatcher, HttpCache, ImageCache, EntryStore, Sanitizer, find_head_image, parse_feed_stream,
+    summary_from_sanitized, extract_summary_text, write_data, render_pages,
+    write_fragments, build_search_index, tokenize, build_assets,
+    RunStats, FeedScheduler, run_daemon, ALLOWED_TAGS, ALLOWED_ATTRS,
+)
+import benchmark
+
+
+def make_rss(name, count):
+    """Genera un feed RSS sintético con `count` entradas."""
+    items = "".join(
+        f"<item><title>{name} {n}</title><link>http://{name}.test/{n}</link>"
+        f"<description>&lt;p&gt;Texto {n} de {name}&lt;/p&gt;</description>"
+        f"<pubDate>Mon, 0{1 + n % 9} Jan 2024 10:00:00 GMT</pubDate></item>"
+        for n in range(count)
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>{name}</title>{items}</channel></rss>'
 
 class TestFetchFeeds(unittest.TestCase):
     """Clase de pruebas unitarias para el script fetch_feeds.py."""
@@ -11,6 +44,7 @@ class TestFetchFeeds(unittest.TestCase):
         """Prueba que extract_image funcione con una respuesta válida."""
         mock_response = MagicMock()
         mock_response.content = b'<meta property="og:image" content="http://example.com/image.jpg" />'
+        mock_response.iter_content.return_value = [mock_response.content]
         mock_get.return_value = mock_response
         
         result = extract_image("http://example.com")
@@ -21,6 +55,7 @@ class TestFetchFeeds(unittest.TestCase):
         """Prueba que extract_image devuelva None si no hay imagen."""
         mock_response = MagicMock()
         mock_response.content = b'<html><body>No image here</body></html>'
+        mock_response.iter_content.return_value = [mock_response.content]
         mock_get.return_value = mock_response
         
         result = extract_image("http://example.com")
@@ -50,5 +85,827 @@ class TestFetchFeeds(unittest.TestCase):
         self.assertEqual(generate_id(link1), hashlib.md5(link1.encode('utf-8')).hexdigest())
         self.assertNotEqual(generate_id(link1), generate_id(link2))
 
+    def test_fetch_feed_reads_content_type(self):
+        """Prueba fetch_feed con una sesión simulada que envía los headers como un servidor real."""
+        content = make_rss("a", 3).encode("utf-8")
+        response = MagicMock(status_code=200, ok=True, content=content, url="http://a.test/rss")
+        response.headers = fetch_feeds.requests.structures.CaseInsensitiveDict(
+            {"Content-Type": "application/rss+xml; charset=utf-8"})
+        response.iter_content.side_effect = lambda chunk_size: iter([content])
+        session = MagicMock()
+        session.get.return_value = response
+        feed = fetch_feeds.fetch_feed("http://a.test/rss", session)
+        self.assertIsNotNone(feed)
+        self.assertFalse(feed.bozo)
+        self.assertEqual([entry.title for entry in feed.entries], ["a 0", "a 1", "a 2"])
+
+
+
+class TestProcessFeeds(unittest.TestCase):
+    """Pruebas del motor concurrente de process_feeds."""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.names = [f"feed{n}" for n in range(6)]
+        with open("feeds.txt", "w") as f:
+            f.write("\n".join(f"http://{name}.test/rss" for name in self.names))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def fake_fetch_feed(self, url, session, cache=None, max_entries=5):
+        time.sleep(random.random() / 50)
+        return feedparser.parse(make_rss(url.split("//")[1].split(".")[0], 8))
+
+    def fake_extract_image(self, url, session=None, cache=None, image_cache=None):
+        time.sleep(random.random() / 50)
+        return f"{url}/og.jpg"
+
+    def test_output_is_deterministic(self):
+        """Prueba que la salida concurrente sea idéntica a la de una ejecución en serie."""
+        with patch.object(fetch_feeds, "fetch_feed", self.fake_fetch_feed), \
+             patch.object(fetch_feeds, "extract_image", self.fake_extract_image):
+            serial = process_feeds(max_workers=1, max_per_host=1)
+            concurrent = process_feeds(max_workers=8, max_per_host=2)
+        self.assertEqual(serial, concurrent)
+        self.assertEqual(len(serial), len(self.names) * fetch_feeds.ENTRIES_PER_FEED)
+        self.assertEqual(serial[0]["image"], serial[0]["link"] + "/og.jpg")
+
+    def test_partial_poll(self):
+        """Prueba que con `poll` solo se descarguen esas URLs y el resto salga de feed_state."""
+        urls = [f"http://{name}.test/rss" for name in self.names]
+        with patch.object(fetch_feeds, "fetch_feed", self.fake_fetch_feed), \
+             patch.object(fetch_feeds, "extract_image", self.fake_extract_image):
+            state = {}
+            full = process_feeds(feed_state=state)
+            self.assertEqual(set(state), set(urls))
+
+            fetched = {}
+            with patch.object(fetch_feeds, "fetch_feed", wraps=self.fake_fetch_feed) as fetch:
+                partial = process_feeds(poll=urls[:1], feed_state=state, fetched=fetched)
+            self.assertEqual([c.args[0] for c in fetch.call_args_list], urls[:1])
+            self.assertEqual(partial, full)
+
+            # Un feed que falla sigue publicándose con su última versión
+            with patch.object(fetch_feeds, "fetch_feed", return_value=None):
+                failed = process_feeds(poll=urls[:2], feed_state=state, fetched=fetched)
+        self.assertEqual(fetched, {urls[0]: None, urls[1]: None})
+        self.assertEqual(failed, full)
+
+    def test_feed_always_down(self):
+        """Prueba que un feed caído solo se consulte cuando el calendario lo permite."""
+        urls = [f"http://{name}.test/rss" for name in self.names]
+        down = urls[0]
+        calls = []
+
+        def fetch(url, session, cache=None, max_entries=5):
+            calls.append(url)
+            return None if url == down else self.fake_fetch_feed(url, session)
+
+        scheduler = FeedScheduler(min_interval=60, max_interval=3600, host_delay=0, rng=random.Random(3))
+        scheduler.learn = lambda *args: 60   # Los feeds que responden se consultan cada minuto
+        scheduler.sync(urls, 0)
+        state = {}
+        attempts = 0
+        with patch.object(fetch_feeds, "fetch_feed", fetch), \
+             patch.object(fetch_feeds, "extract_image", self.fake_extract_image):
+            for now in range(0, 1800, 30):
+                due = scheduler.due(now) if now else None
+                if now and not due:
+                    continue
+                del calls[:]
+                fetched = {}
+                news = process_feeds(poll=due, feed_state=state, fetched=fetched)
+                for url, feed in fetched.items():
+                    scheduler.record(url, feed, now)
+                self.assertEqual(sorted(calls), sorted(due or urls))
+                self.assertEqual(len(news), (len(urls) - 1) * fetch_feeds.ENTRIES_PER_FEED)
+                attempts += calls.count(down)
+        # 30-60 s, 60-120 s, 120-240 s, 240-480 s, 480-960 s...: como mucho 6 intentos en 30 minutos
+        self.assertNotIn(down, state)
+        self.assertLessEqual(attempts, 6)
+        self.assertGreater(attempts, 2)
+
+    def test_concurrency_options(self):
+        """Prueba que los límites de la línea de comandos lleguen a la sesión y a process_feeds."""
+        args = fetch_feeds.parse_args(["--max-workers", "3", "--max-per-host", "2"])
+        self.assertEqual((args.max_workers, args.max_per_host), (3, 2))
+        for invalid in (["--max-per-host", "0"], ["--page-size", "0"], ["--entries-per-feed", "-1"],
+                        ["--archive-days", "-1"]):
+            with patch("sys.stderr"), self.assertRaises(SystemExit):
+                fetch_feeds.parse_args(invalid)
+        self.assertEqual(fetch_feeds.parse_args(["--archive-days", "0"]).archive_days, 0)
+
+        adapter = fetch_feeds.create_session(pool_size=2, max_workers=3).get_adapter("http://a.test/")
+        self.assertEqual((adapter._pool_connections, adapter._pool_maxsize), (3, 2))
+
+        with patch.object(fetch_feeds, "process_feeds", return_value=[]) as mock_process, \
+             patch.object(fetch_feeds, "build_site"), patch.object(fetch_feeds, "STATS"):
+            fetch_feeds.main(["--max-workers", "3", "--max-per-host", "2"])
+        kwargs = mock_process.call_args.kwargs
+        self.assertEqual((kwargs["max_workers"], kwargs["max_per_host"]), (3, 2))
+
+    def test_host_dispatcher(self):
+        """Prueba que HostDispatcher respete el límite por host sin bloquear hilos del pool."""
+        active, peak, finished, lock = {}, {}, [], threading.Lock()
+
+        def work(host, delay):
+            with lock:
+                active[host] = active.get(host, 0) + 1
+                peak[host] = max(peak.get(host, 0), active[host])
+            time.sleep(delay)
+            with lock:
+                active[host] -= 1
+                finished.append(host)
+            return host
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            dispatcher = HostDispatcher(pool, 2)
+            futures = [dispatcher.submit(f"http://slow.test/{n}", work, "slow", 0.05) for n in range(8)]
+            futures += [dispatcher.submit(f"http://fast.test/{n}", work, "fast", 0) for n in range(2)]
+            results = [future.result() for future in as_completed(futures)]
+
+        self.assertEqual(sorted(results), ["fast"] * 2 + ["slow"] * 8)
+        self.assertEqual(peak["slow"], 2)
+        # Los trabajos en cola de un host no ocupan los hilos que necesitan los demás
+        self.assertEqual(finished[:2], ["fast", "fast"])
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            failing = HostDispatcher(pool, 1).submit("http://a.test/", int, "x")
+            self.assertRaises(ValueError, failing.result)
+
+
+def make_response(status, content=b"", headers=None):
+    """Crea una respuesta simulada de requests."""
+    response = MagicMock()
+    response.status_code = status
+    response.content = content
+    response.iter_content.side_effect = lambda chunk_size: (
+        content[n:n + chunk_size] for n in range(0, len(content), chunk_size))
+    response.headers = headers or {}
+    response.url = "http://a.test/"
+    return response
+
+
+class TestEntryStore(unittest.TestCase):
+    """Pruebas de la compilación incremental con EntryStore."""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        with open("feeds.txt", "w") as f:
+            f.write("http://a.test/rss")
+        self.store = EntryStore(":memory:")
+        self.feed = feedparser.parse(make_rss("a", 8))
+
+    def tearDown(self):
+        self.store.close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def run_feeds(self, **kwargs):
+        extract = MagicMock(side_effect=lambda url, *args: url + "/og.jpg")
+        with patch.object(fetch_feeds, "fetch_feed", lambda *args: self.feed), \
+             patch.object(fetch_feeds, "extract_image", extract):
+            return process_feeds(entry_store=self.store, **kwargs), extract.call_count
+
+    def test_unchanged_entries_are_reused(self):
+        """Prueba que una segunda ejecución no vuelva a procesar entradas sin cambios."""
+        first, fetched = self.run_feeds()
+        self.assertEqual(fetched, 5)
+        with patch.object(fetch_feeds, "build_entry") as mock_build:
+            second, fetched = self.run_feeds()
+        mock_build.assert_not_called()
+        self.assertEqual(fetched, 0)
+        self.assertEqual(first, second)
+
+        self.feed.entries[0]["title"] = "a 0 (actualizado)"
+        third, fetched = self.run_feeds()
+        self.assertEqual(fetched, 1)
+        self.assertIn("a 0 (actualizado)", [news["title"] for news in third])
+
+        # Un cambio en la sanitización (por ejemplo, subir SANITIZE_VERSION) reprocesa todo
+        with patch.object(fetch_feeds, "SANITIZE_SIGNATURE", fetch_feeds.SANITIZE_SIGNATURE + "+1"), \
+             patch.object(fetch_feeds, "build_entry", wraps=fetch_feeds.build_entry) as mock_build:
+            self.run_feeds()
+        self.assertEqual(mock_build.call_count, 5)
+
+    def test_archive_window(self):
+        """Prueba que las noticias que salen del feed se mantengan durante el histórico."""
+        first, _ = self.run_feeds(entries_per_feed=3)
+        self.feed = feedparser.parse(make_rss("b", 2))
+        archived, _ = self.run_feeds(entries_per_feed=3)
+        self.assertEqual(len(archived), 5)
+        self.assertLessEqual({news["id"] for news in first}, {news["id"] for news in archived})
+        current_only, _ = self.run_feeds(entries_per_feed=3, archive_days=0)
+        self.assertEqual(len(current_only), 2)
+        self.assertEqual(self.store.archive(0, 100), current_only)
+
+
+class TestSanitizer(unittest.TestCase):
+    """Pruebas de la etapa de sanitización memorizada."""
+
+    CONTENTS = [
+        '<p>Hola <b>mundo</b> &amp; <a href="http://a.test/?a=1&b=2" title="a>b">enlace</a></p>',
+        '<script>alert("<b>x</b>")</script><style>p {}</style>texto',
+        '&nbsp;&copy;&copy d &#150; &#x2019; &#129; &#0; &#99999999; &foo; &a.b; &#12',
+        '<!-- comentario --><p title=\'x"y\'>q</p><img alt="a>b" src="i.png">z',
+        '<iframe src="x">dentro</iframe><pre>\n\n  código</pre><textarea><b>t</b></textarea>',
+        'a &lt;b&gt; c <p>a</p\n>b <br/> \r\n' + "muy largo " * 60,
+        'Texto plano',
+    ]
+
+    def old_pipeline(self, html):
+        clean = fetch_feeds.bleach.clean(html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRS, strip=True)
+        return clean, extract_summary_text(clean)
+
+    def test_summary_matches_beautifulsoup(self):
+        """Prueba que el resumen sin segundo parseo coincida exactamente con el anterior."""
+        rng = random.Random(1)
+        chars = '<>&"\'/ =abpimgscrt;!-#x19fF\n'
+        contents = self.CONTENTS + [
+            "".join(rng.choice(chars) for _ in range(rng.randint(1, 40))) for _ in range(3000)]
+        for html in contents:
+            clean, expected = self.old_pipeline(html)
+            self.assertEqual(summary_from_sanitized(clean), expected, html)
+
+    def test_summary_whitespace_between_tags(self):
+        """Prueba que los textos de solo espacios se reduzcan como en BeautifulSoup, salvo en <pre>."""
+        fixed = [
+            ("<p>Uno</p>\n\n<p>Dos</p>", "Uno\nDos"),
+            ("<ul>\n  <li>a</li>\n  <li>b</li>\n</ul>", "a\nb"),
+            ("<b>x</b>\t<i>y</i>", "x y"),
+            ("<pre>a\n\n  <b>b</b>\n\n</pre>\n\n<p>c</p>", "a\n\n  b\n\n\nc"),
+        ]
+        for html, summary in fixed:
+            clean, expected = self.old_pipeline(html)
+            self.assertEqual(expected, summary)
+            self.assertEqual(summary_from_sanitized(clean), expected, html)
+
+        rng = random.Random(2)
+        tokens = ["<p>", "</p>", "<pre>", "</pre>", "<b>", "</b>", "<br>", "<textarea>", "</textarea>",
+                  "\n", "  ", "\t", "\r\n", "&#32;", "&#10;", "&nbsp;", "x", "y z"]
+        for _ in range(3000):
+            html = "".join(rng.choice(tokens) for _ in range(rng.randint(1, 12)))
+            clean, expected = self.old_pipeline(html)
+            self.assertEqual(summary_from_sanitized(clean), expected, html)
+
+    def test_batch_matches_and_memoizes(self):
+        """Prueba que el lote dé el mismo resultado que antes y memorice los contenidos vistos."""
+        expected = [self.old_pipeline(html) for html in self.CONTENTS]
+        store = EntryStore(":memory:")
+        self.assertEqual(Sanitizer(store, processes=1).run(self.CONTENTS), expected)
+        with patch.object(fetch_feeds, "sanitize_timed") as mock_sanitize:
+            self.assertEqual(Sanitizer(store).run(self.CONTENTS), expected)
+        mock_sanitize.assert_not_called()
+        store.close()
+
+    def test_process_pool(self):
+        """Prueba que el reparto en procesos conserve el orden y el resultado."""
+        contents = self.CONTENTS * 3 + [f"<p>Entrada {n}</p>" for n in range(20)]
+        expected = [self.old_pipeline(html) for html in contents]
+        self.assertEqual(Sanitizer(processes=2, pool_min=1).run(contents), expected)
+
+
+class TestOutput(unittest.TestCase):
+    """Pruebas de la salida fragmentada, paginada y precomprimida."""
+
+    TEMPLATES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dist = self.tmp.name
+        self.news = [
+            {"id": generate_id(f"http://{feed}.test/{n}"), "title": f"{feed} {n}",
+             "link": f"http://{feed}.test/{n}", "image": fetch_feeds.FALLBACK_IMAGE,
+             "summary": "Resumen", "content": "<p>Contenido</p>", "published": None,
+             "has_full_content": False, "feed": f"http://{feed}.test/rss"}
+            for n in range(7) for feed in ("a", "b")
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, relative):
+        with open(os.path.join(self.dist, relative), "rb") as f:
+            return f.read()
+
+    def test_shards_and_manifest(self):
+        """Prueba los fragmentos JSON por página y por feed, y sus .gz."""
+        manifest = write_data(self.news, self.dist, page_size=5)
+        self.assertEqual(manifest["pages"], ["data/page-1.json", "data/page-2.json", "data/page-3.json"])
+        self.assertEqual([feed["total"] for feed in manifest["feeds"]], [7, 7])
+        self.assertEqual(json.loads(self.read("news.json")), self.news)
+        self.assertNotIn(b"\n", self.read("news.json"))
+        feed_pages = manifest["feeds"][1]["pages"]
+        self.assertEqual(len(feed_pages), 2)
+        self.assertEqual(json.loads(self.read(feed_pages[1])), self.news[11::2])
+        self.assertEqual(gzip.decompress(self.read("data/page-3.json.gz")), self.read("data/page-3.json"))
+
+        # Con menos noticias sobran fragmentos, que deben desaparecer
+        write_data(self.news[:3], self.dist, page_size=5)
+        self.assertFalse(os.path.exists(os.path.join(self.dist, "data/page-2.json")))
+        self.assertFalse(os.path.exists(os.path.join(self.dist, "data/page-2.json.gz")))
+
+    def test_paginated_html(self):
+        """Prueba que la portada tenga un tamaño fijo y que el resto vaya a page/N.html."""
+        env = Environment(loader=FileSystemLoader(self.TEMPLATES))
+        render_pages(env, self.news, self.dist, page_size=5)
+        index = self.read("index.html").decode("utf-8")
+        self.assertEqual(index.count('class="news-item"'), 5)
+        self.assertIn('href="page/2.html"', index)
+        last = self.read("page/3.html").decode("utf-8")
+        self.assertEqual(last.count('class="news-item"'), 4)
+        self.assertIn('href="../assets/css/style.css"', last)
+        self.assertIn('src="../assets/img/fallback.jpg"', last)
+        self.assertIn('href="../page/2.html"', last)
+        self.assertEqual(gzip.decompress(self.read("page/2.html.gz")), self.read("page/2.html"))
+
+        render_pages(env, self.news[:5], self.dist, page_size=5)
+        self.assertFalse(os.path.exists(os.path.join(self.dist, "page/2.html")))
+        self.assertNotIn("page/2.html", self.read("index.html").decode("utf-8"))
+
+    def test_lazy_content_fragments(self):
+        """Prueba que el contenido completo vaya a su fragmento y no a la página."""
+        self.news[0].update(has_full_content=True, content="<p>Cuerpo largo del artículo</p>")
+        write_fragments(self.news, self.dist)
+        fragment = os.path.join("content", self.news[0]["id"] + ".html")
+        self.assertEqual(self.read(fragment).decode("utf-8"), "<p>Cuerpo largo del artículo</p>")
+        name = os.path.basename(fragment)
+        written = sorted(os.listdir(os.path.join(self.dist, "content")))
+        self.assertEqual([n for n in written if not n.endswith(".br")], [name, name + ".gz"])
+
+        env = Environment(loader=FileSystemLoader(self.TEMPLATES))
+        render_pages(env, self.news, self.dist)
+        index = self.read("index.html").decode("utf-8")
+        self.assertNotIn("Cuerpo largo", index)
+        self.assertIn(f'data-src="content/{self.news[0]["id"]}.html"', index)
+
+        self.news[0]["has_full_content"] = False
+        write_fragments(self.news, self.dist)
+        self.assertEqual(os.listdir(os.path.join(self.dist, "content")), [])
+
+    def test_search_index(self):
+        """Prueba el índice invertido de títulos y resúmenes."""
+        self.assertEqual(tokenize("¡El Niño llegó a la CIUDAD, el niño!"), ["nino", "llego", "ciudad"])
+        news = [
+            {"id": "a", "title": "Elecciones en España", "link": "http://a.test/1", "summary": "Votación"},
+            {"id": "b", "title": "Economía", "link": "http://a.test/2", "summary": "Elecciones y mercados"},
+        ]
+        index = build_search_index(news, page_size=10)
+        self.assertEqual(index["terms"]["elecciones"], [0, 1])
+        self.assertEqual(index["terms"]["espana"], [0])
+        self.assertNotIn("en", index["terms"])
+        self.assertEqual(index["docs"][1], ["b", "Economía", "http://a.test/2"])
+        manifest = write_data(self.news, self.dist)
+        self.assertEqual(manifest["search"], "data/search.json")
+        self.assertEqual(len(json.loads(self.read("data/search.json"))["docs"]), len(self.news))
+
+
+class TestAssets(unittest.TestCase):
+    """Pruebas de la publicación de assets con hash."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "assets")
+        self.dist = os.path.join(self.tmp.name, "dist")
+        self.manifest = os.path.join(self.tmp.name, "assets.json")
+        for folder in ("css", "js", "img"):
+            os.makedirs(os.path.join(self.source, folder))
+        self.write("css/style.css", b"@import url('https://fonts.test/f.css');\n"
+                                    b"body { background: url('../img/bg.png'); }")
+        self.write("js/main.js", b"console.log(1);")
+        self.write("img/bg.png", b"no es una imagen de verdad")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative, data):
+        with open(os.path.join(self.source, relative), "wb") as f:
+            f.write(data)
+
+    def read(self, relative):
+        with open(os.path.join(self.dist, relative), "rb") as f:
+            return f.read()
+
+    def test_hashed_names_and_css_rewrite(self):
+        """Prueba los nombres con hash, las url() reescritas y la limpieza de versiones viejas."""
+        assets = build_assets(self.source, self.dist, self.manifest)
+        self.assertRegex(assets["assets/css/style.css"], r"^assets/css/style\.[0-9a-f]{8}\.css$")
+        css = self.read(assets["assets/css/style.css"]).decode("utf-8")
+        self.assertIn(f"url('../img/{os.path.basename(assets['assets/img/bg.png'])}')", css)
+        self.assertIn("url('https://fonts.test/f.css')", css)
+        self.assertEqual(json.loads(self.read("assets/manifest.json")), assets)
+        self.assertTrue(os.path.exists(os.path.join(self.dist, assets["assets/js/main.js"] + ".gz")))
+
+        # Al cambiar la imagen cambian su nombre y el de la hoja que la usa
+        self.write("img/bg.png", b"otra imagen")
+        updated = build_assets(self.source, self.dist, self.manifest)
+        self.assertNotEqual(updated["assets/img/bg.png"], assets["assets/img/bg.png"])
+        self.assertNotEqual(updated["assets/css/style.css"], assets["assets/css/style.css"])
+        self.assertEqual(updated["assets/js/main.js"], assets["assets/js/main.js"])
+        self.assertFalse(os.path.exists(os.path.join(self.dist, assets["assets/img/bg.png"])))
+
+    def test_unchanged_sources_are_not_copied(self):
+        """Prueba que una segunda publicación sin cambios no escriba nada."""
+        build_assets(self.source, self.dist, self.manifest)
+        with patch.object(fetch_feeds, "write_artifact", wraps=fetch_feeds.write_artifact) as mock_write:
+            build_assets(self.source, self.dist, self.manifest)
+        self.assertEqual([c.args[0] for c in mock_write.call_args_list],
+                         [os.path.join(self.dist, "assets", "manifest.json")])
+
+    def test_json_points_to_published_fallback(self):
+        """Prueba que los JSON publicados apunten a la imagen de respaldo con hash, que sí existe."""
+        repo = os.path.dirname(os.path.abspath(__file__))
+        news = [{"id": "a", "title": "A", "link": "http://a.test/a", "image": fetch_feeds.FALLBACK_IMAGE,
+                 "summary": "", "content": "", "published": "2024-01-02", "has_full_content": False, "feed": "http://a.test/rss"},
+                {"id": "b", "title": "B", "link": "http://a.test/b", "image": "http://a.test/b.jpg",
+                 "summary": "", "content": "", "published": "2024-01-01", "has_full_content": False, "feed": "http://a.test/rss"}]
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        try:
+            shutil.rmtree(self.source)
+            shutil.copytree(os.path.join(repo, "assets"), "assets")
+            fetch_feeds.build_site(Environment(loader=FileSystemLoader(os.path.join(repo, "templates"))), news)
+            for relative in ("news.json", "data/page-1.json",
+                             f"data/feeds/{generate_id('http://a.test/rss')}/page-1.json"):
+                published = json.loads(self.read(relative))
+                self.assertRegex(published[0]["image"], r"^assets/img/fallback\.[0-9a-f]{8}\.")
+                self.assertTrue(os.path.exists(os.path.join(self.dist, published[0]["image"])))
+                self.assertEqual(published[1]["image"], "http://a.test/b.jpg")
+            self.assertEqual(news[0]["image"], fetch_feeds.FALLBACK_IMAGE)
+        finally:
+            os.chdir(cwd)
+
+    def test_stale_dist_is_repaired(self):
+        """Prueba que una dist/ vieja o incompleta (como la de un checkout limpio) se complete."""
+        repo = os.path.dirname(os.path.abspath(__file__))
+        news = [{"id": str(n), "title": f"N{n}", "link": f"http://a.test/{n}", "image": "http://a.test/i.jpg",
+                 "summary": "", "content": "", "published": f"2024-01-{n + 1:02d}", "has_full_content": False,
+                 "feed": "http://a.test/rss"} for n in range(3)]
+        env = Environment(loader=FileSystemLoader(os.path.join(repo, "templates")))
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        try:
+            shutil.rmtree(self.source)
+            shutil.copytree(os.path.join(repo, "assets"), "assets")
+            fetch_feeds.build_site(env, news, page_size=2)
+            expected = self.read("index.html")
+
+            # dist/ de un checkout: index.html antiguo y sin page/
+            with open(os.path.join(self.dist, "index.html"), "wb") as f:
+                f.write(b'<link rel="stylesheet" href="assets/css/style.css">')
+            shutil.rmtree(os.path.join(self.dist, "page"))
+            fetch_feeds.build_site(env, news, page_size=2)
+            self.assertEqual(self.read("index.html"), expected)
+            self.assertTrue(os.path.exists(os.path.join(self.dist, "page", "2.html")))
+
+            # Sin cambios no se reescribe nada
+            fetch_feeds.STATS.reset()
+            fetch_feeds.build_site(env, news, page_size=2)
+            self.assertNotIn("output.files_written", fetch_feeds.STATS.report()["counters"])
+        finally:
+            os.chdir(cwd)
+
+    @unittest.skipUnless(fetch_feeds.Image, "Pillow no está instalado")
+    def test_image_variants(self):
+        """Prueba que las imágenes configuradas se publiquen reducidas."""
+        buffer = io.BytesIO()
+        fetch_feeds.Image.new("RGB", (400, 200), "green").save(buffer, "PNG")
+        self.write("img/bg.png", buffer.getvalue())
+        with patch.dict(fetch_feeds.IMAGE_VARIANTS, {"assets/img/bg.png": (100, "JPEG", 80)}, clear=True):
+            assets = build_assets(self.source, self.dist, self.manifest)
+        self.assertTrue(assets["assets/img/bg.png"].endswith(".jpg"))
+        with fetch_feeds.Image.open(os.path.join(self.dist, assets["assets/img/bg.png"])) as image:
+            self.assertEqual(image.size, (100, 50))
+
+
+class TestHttpCache(unittest.TestCase):
+    """Pruebas de la caché HTTP condicional."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "http")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_feed_not_modified_reuses_parsed_result(self):
+        """Prueba que un 304 devuelva el feed parseado en la ejecución anterior."""
+        session = MagicMock()
+        session.get.return_value = make_response(
+            200, make_rss("a", 3).encode(), {"ETag": '"v1"', "Content-Type": "application/rss+xml"})
+        cache = HttpCache(self.path)
+        first = fetch_feed("http://a.test/rss", session, cache)
+        self.assertEqual(len(first.entries), 3)
+        cache.save()
+
+        cache = HttpCache(self.path)
+        session.get.return_value = make_response(304)
+        with patch("feedparser.parse") as mock_parse:
+            second = fetch_feed("http://a.test/rss", session, cache)
+        mock_parse.assert_not_called()
+        self.assertEqual(session.get.call_args.kwargs["headers"], {"If-None-Match": '"v1"'})
+        self.assertEqual([e.title for e in second.entries], [e.title for e in first.entries])
+
+    def test_image_not_modified(self):
+        """Prueba que extract_image reutilice la imagen guardada tras un 304."""
+        session = MagicMock()
+        session.get.return_value = make_response(
+            200, b'<meta property="og:image" content="http://a.test/i.jpg" />',
+            {"Last-Modified": "Mon, 01 Jan 2024 10:00:00 GMT"})
+        cache = HttpCache(self.path)
+        self.assertEqual(extract_image("http://a.test/1", session, cache), "http://a.test/i.jpg")
+
+        session.get.return_value = make_response(304)
+        self.assertEqual(extract_image("http://a.test/1", session, cache), "http://a.test/i.jpg")
+        self.assertEqual(session.get.call_args.kwargs["headers"]["If-Modified-Since"],
+                         "Mon, 01 Jan 2024 10:00:00 GMT")
+
+    def test_eviction(self):
+        """Prueba que save() desaloje las URLs menos usadas al superar el límite."""
+        cache = HttpCache(self.path, max_bytes=250)
+        for n in range(3):
+            cache.store(f"http://a.test/{n}", make_response(200, headers={"ETag": str(n)}), "x" * 100)
+        cache.load("http://a.test/0")
+        cache.save()
+
+        cache = HttpCache(self.path)
+        self.assertTrue(cache.load("http://a.test/0")[0])
+        self.assertFalse(cache.load("http://a.test/1")[0])
+        self.assertTrue(cache.load("http://a.test/2")[0])
+        self.assertEqual(cache.headers("http://a.test/1"), {})
+
+
+class TestImageCache(unittest.TestCase):
+    """Pruebas del almacén de imágenes por ID de entrada."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "images.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hit_skips_page_fetch(self):
+        """Prueba que una imagen guardada evite descargar la página otra vez."""
+        session = MagicMock()
+        session.get.return_value = make_response(200, b'<html><body>Sin imagen</body></html>')
+        cache = ImageCache(self.path)
+        self.assertIsNone(extract_image("http://a.test/1", session, image_cache=cache))
+        cache.save()
+
+        cache = ImageCache(self.path)
+        self.assertEqual(cache.get(generate_id("http://a.test/1")), (True, None))
+        self.assertIsNone(extract_image("http://a.test/1", session, image_cache=cache))
+        self.assertEqual(session.get.call_count, 1)
+
+    def test_errors_are_not_cached(self):
+        """Prueba que un error de red no se guarde como página sin imagen."""
+        session = MagicMock()
+        session.get.side_effect = fetch_feeds.requests.exceptions.ConnectionError("caído")
+        cache = ImageCache(self.path)
+        self.assertIsNone(extract_image("http://a.test/1", session, image_cache=cache))
+        self.assertEqual(cache.get(generate_id("http://a.test/1")), (False, None))
+
+    def test_ttl_and_lru(self):
+        """Prueba la caducidad por TTL, la caché negativa y el límite LRU."""
+        cache = ImageCache(self.path, ttl=100, miss_ttl=10, max_entries=1)
+        with patch("time.time", return_value=1000):
+            cache.put("a", "http://a.test/a.jpg")
+            cache.put("b", None)
+            cache.put("c", "http://a.test/c.jpg")
+        with patch("time.time", return_value=1050):
+            self.assertEqual(cache.get("a"), (True, "http://a.test/a.jpg"))
+            self.assertEqual(cache.get("b"), (False, None))
+            self.assertEqual(cache.stats(), {"entries": 3, "images": 2, "misses": 1, "expired": 1})
+            cache.save()
+
+        cache = ImageCache(self.path, ttl=100)
+        with patch("time.time", return_value=1060):
+            self.assertEqual(cache.get("a"), (True, "http://a.test/a.jpg"))
+            self.assertEqual(cache.get("c"), (False, None))
+            self.assertEqual(cache.purge(), 1)
+
+
+class TestStreaming(unittest.TestCase):
+    """Pruebas de la lectura acotada de páginas y feeds."""
+
+    def streamed(self, content, content_type="text/html"):
+        """Respuesta simulada que registra cuántos bytes se llegaron a leer."""
+        response = make_response(200, content, {"Content-Type": content_type})
+        response.read = 0
+
+        def chunks(chunk_size):
+            for n in range(0, len(content), 64):
+                response.read += len(content[n:n + 64])
+                yield content[n:n + 64]
+        response.iter_content.side_effect = chunks
+        return response
+
+    def test_head_matches_beautifulsoup(self):
+        """Prueba que el tokenizador del <head> elija la misma imagen que BeautifulSoup."""
+        heads = [
+            '<meta property="og:image" content="/og.jpg"><link rel="icon" href="/i.png">',
+            '<link rel="shortcut icon" href="/i.png"><meta property="og:image" content="/og.jpg">',
+            '<meta property="og:image" content=""><link rel="icon" href="/i.png">',
+            '<link rel="icon" href=""><link rel="icon" href="/i.png">',
+            '<meta property="og:image" content="/a&amp;b.jpg">',
+            '<title>Sin imagen</title>',
+        ]
+        for head in heads:
+            html = f"<html><head>{head}</head><body><p>Texto</p></body></html>".encode()
+            soup = fetch_feeds.BeautifulSoup(html, "html.parser")
+            image = soup.find("meta", property="og:image")
+            expected = image["content"] if image and image.get("content") else None
+            if not expected:
+                icon = soup.find("link", rel="icon")
+                expected = icon["href"] if icon and icon.get("href") else None
+            self.assertEqual(find_head_image(self.streamed(html)), expected, head)
+
+    def test_head_stops_early(self):
+        """Prueba que la lectura se corte al terminar el <head> y que se cierre la conexión."""
+        html = b'<html><head><link rel="icon" href="/i.png"></head><body>' + b"x" * 100000
+        response = self.streamed(html)
+        self.assertEqual(find_head_image(response), "/i.png")
+        self.assertLess(response.read, 200)
+        response.close.assert_called_once()
+        self.assertIsNone(find_head_image(self.streamed(b"<p>" + b"x" * 100000), max_bytes=1000))
+
+    def test_feed_stops_after_entries(self):
+        """Prueba que el feed se deje de leer tras las entradas necesarias."""
+        xml = make_rss("big", 300).encode()
+        response = self.streamed(xml, "application/rss+xml")
+        feed = parse_feed_stream(response, max_entries=5)
+        full = feedparser.parse(xml, response_headers={
+            "content-type": "application/rss+xml", "content-location": "http://a.test/"})
+        self.assertFalse(feed.bozo)
+        self.assertEqual(feed.entries[:5], full.entries[:5])
+        self.assertLess(response.read, len(xml) / 20)
+
+    def test_feed_atom_and_byte_cap(self):
+        """Prueba el recorte de feeds Atom y el límite de bytes."""
+        entries = "".join(
+            f'<entry><title>E{n}</title><link href="http://a.test/{n}"/><id>{n}</id>'
+            f'<updated>2024-01-01T00:00:00Z</updated></entry>' for n in range(50))
+        xml = f'<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom"><title>A</title>{entries}</feed>'.encode()
+        feed = parse_feed_stream(self.streamed(xml, "application/atom+xml"), max_entries=3)
+        self.assertEqual([e.title for e in feed.entries], ["E0", "E1", "E2"])
+
+        feed = parse_feed_stream(self.streamed(xml, "application/atom+xml"), max_entries=40, max_bytes=1024)
+        self.assertFalse(feed.bozo)
+        self.assertGreater(len(feed.entries), 0)
+        self.assertLess(len(feed.entries), 40)
+
+
+class TestBenchmark(unittest.TestCase):
+    """Pruebas de la instrumentación y del benchmark con servidor local."""
+
+    def test_run_stats(self):
+        """Prueba que las etapas acumulen tiempos entre hilos y que el informe sea JSON."""
+        stats = RunStats()
+
+        def work():
+            with stats.stage("trabajo"):
+                time.sleep(0.01)
+            stats.count("bytes", 10)
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        report = stats.report()
+        self.assertEqual(report["stages"]["trabajo"]["count"], 4)
+        self.assertGreaterEqual(report["stages"]["trabajo"]["seconds"], 0.04)
+        self.assertEqual(report["counters"], {"bytes": 40})
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "informe", "run.json")
+            stats.save(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)["counters"], report["counters"])
+        stats.reset()
+        self.assertEqual(stats.report()["stages"], {})
+
+    def test_cold_and_warm_build(self):
+        """Prueba una generación completa contra el servidor sintético, en frío y en caliente."""
+        with tempfile.TemporaryDirectory() as tmp:
+            reports = benchmark.run_benchmark(workdir=tmp, feeds=3, items=4, latency=0)
+            with open(os.path.join(tmp, "dist", "news.json")) as f:
+                news = json.load(f)
+
+        self.assertEqual(len(news), 12)
+        # Con el formato por defecto se alternan feeds RSS y Atom
+        self.assertEqual(sorted(Counter(item["feed"] for item in news).values()), [4, 4, 4])
+        self.assertTrue(all(item["image"].endswith(".jpg") for item in news))
+        cold, warm = reports["cold"], reports["warm"]
+        for stage in ("feed.fetch", "feed.parse", "image.fetch", "image.parse", "sanitize.clean", "render"):
+            self.assertIn(stage, cold["stages"])
+        self.assertEqual(cold["counters"]["entries.built"], 12)
+        self.assertEqual(warm["counters"]["entries.unchanged"], 12)
+        self.assertEqual(warm["counters"]["http.not_modified"], 3)
+        self.assertNotIn("output.files_written", warm["counters"])
+
+    def test_atom_feeds_are_truncated(self):
+        """Prueba que los feeds Atom sintéticos se corten tras las entradas necesarias."""
+        with tempfile.TemporaryDirectory() as tmp:
+            reports = benchmark.run_benchmark(workdir=tmp, runs=("cold",), feeds=2, items=40,
+                                              latency=0, fmt="atom")
+        cold = reports["cold"]
+        self.assertEqual(cold["counters"]["entries.published"], 2 * fetch_feeds.ENTRIES_PER_FEED)
+        self.assertLess(cold["counters"]["feed.bytes"], 2 * 40 * benchmark.BENCH_ITEM_BYTES)
+
+
+def make_timed_feed(gap_minutes, count=5, ttl=None, headers=None):
+    """Feed parseado con `count` entradas separadas `gap_minutes` minutos."""
+    items = "".join(
+        f"<item><title>N{n}</title><link>http://a.test/{n}</link>"
+        f"<pubDate>{formatdate(1700000000 - n * gap_minutes * 60, usegmt=True)}</pubDate></item>"
+        for n in range(count))
+    ttl = f"<ttl>{ttl}</ttl>" if ttl else ""
+    return feedparser.parse(f'<rss version="2.0"><channel><title>A</title>{ttl}{items}</channel></rss>',
+                            response_headers=headers or {})
+
+
+class TestDaemon(unittest.TestCase):
+    """Pruebas del calendario por feed y del modo daemon."""
+
+    def test_interval_from_publish_rate_and_hints(self):
+        """Prueba que el intervalo salga del ritmo de publicación y respete ttl y max-age."""
+        scheduler = FeedScheduler(jitter=0)
+        url = "http://a.test/rss"
+        self.assertEqual(scheduler.record(url, make_timed_feed(60), 0), 5)
+        self.assertEqual(scheduler.interval(url), 30 * 60)
+        self.assertEqual(scheduler.next_wakeup(), 30 * 60)
+        self.assertEqual(scheduler.record(url, make_timed_feed(60), 100), 0)
+
+        scheduler.record(url, make_timed_feed(1), 0)
+        self.assertEqual(scheduler.interval(url), fetch_feeds.POLL_MIN_INTERVAL)
+        scheduler.record(url, make_timed_feed(24 * 60), 0)
+        self.assertEqual(scheduler.interval(url), fetch_feeds.POLL_MAX_INTERVAL)
+        scheduler.record(url, make_timed_feed(60, ttl=120), 0)
+        self.assertEqual(scheduler.interval(url), 120 * 60)
+        scheduler.record(url, make_timed_feed(60, headers={"cache-control": "public, max-age=3600"}), 0)
+        self.assertEqual(scheduler.interval(url), 3600)
+
+    def test_backoff_and_host_politeness(self):
+        """Prueba la espera exponencial con jitter tras fallos y el margen entre consultas a un host."""
+        scheduler = FeedScheduler(min_interval=60, rng=random.Random(1))
+        url = "http://a.test/rss"
+        waits = []
+        for _ in range(4):
+            scheduler.record(url, None, 0)
+            waits.append(scheduler.next_wakeup())
+        for failures, wait in enumerate(waits):
+            self.assertTrue(60 * 2 ** failures * 0.5 <= wait <= 60 * 2 ** failures)
+
+        urls = ["http://a.test/1", "http://a.test/2", "http://b.test/1"]
+        scheduler.sync(urls, 0)
+        self.assertEqual(scheduler.due(0), ["http://a.test/1", "http://b.test/1"])
+        scheduler.record("http://a.test/1", make_timed_feed(60), 0)
+        scheduler.record("http://b.test/1", make_timed_feed(60), 0)
+        self.assertEqual(scheduler.due(5), [])
+        self.assertEqual(scheduler.due(fetch_feeds.POLL_HOST_DELAY), ["http://a.test/2"])
+
+    def test_regenerates_only_on_changes(self):
+        """Prueba que el daemon reutilice su estado y solo regenere dist/ cuando cambian las noticias."""
+        stop = threading.Event()
+        results = [[{"id": "a"}], [{"id": "a"}], [{"id": "b"}, {"id": "a"}]]
+        polls = []
+
+        def fake_process_feeds(**kwargs):
+            polls.append((kwargs["poll"], kwargs["session"], kwargs["feed_state"]))
+            kwargs["fetched"]["http://a.test/rss"] = make_timed_feed(60, count=len(polls))
+            if len(polls) == len(results):
+                stop.set()
+            return results[len(polls) - 1]
+
+        args = fetch_feeds.parse_args(["--report", "report.json"])
+        scheduler = FeedScheduler(min_interval=0, host_delay=0)
+        scheduler.learn = lambda *a: 0
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                with open("feeds.txt", "w") as f:
+                    f.write("http://a.test/rss\n")
+                with patch.object(fetch_feeds, "process_feeds", side_effect=fake_process_feeds), \
+                     patch.object(fetch_feeds, "build_site") as build_site:
+                    run_daemon(args, MagicMock(), MagicMock(), MagicMock(), MagicMock(),
+                               scheduler=scheduler, stop=stop)
+                self.assertTrue(os.path.exists("report.json"))
+            finally:
+                os.chdir(cwd)
+
+        self.assertEqual(polls[0][0], None)
+        self.assertEqual(polls[1][0], ["http://a.test/rss"])
+        self.assertIs(polls[1][1], polls[2][1])
+        self.assertIs(polls[1][2], polls[2][2])
+        self.assertEqual([c.args[1] for c in build_site.call_args_list], [results[0], results[2]])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file